@@ -1,3 +1,14 @@
 from .dpr.src.rewiring_functions import *
 from .dpr.src.generate_graphs_itm import *
+from .dpr.src.cdf_tables import *
 from .dpr.src.create_networks import *
+from .dpr.src.assortativity import *
+from .dpr.src.compact_graph import *
+from .dpr.src.results import *
+from .dpr.src.ensemble import *
+from .dpr.src.checkpoint import *
+from .dpr.src.batch_swaps import *
+from .dpr.src.disk_cache import *
+from .dpr.src.extreme_cache import *
+from .dpr.src.sweep import *
+from .dpr.src.profiling import *
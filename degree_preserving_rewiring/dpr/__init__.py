@@ -1,3 +1,14 @@
 from .src.rewiring_functions import *
 from .src.generate_graphs_itm import *
+from .src.cdf_tables import *
 from .src.create_networks import *
+from .src.assortativity import *
+from .src.compact_graph import *
+from .src.results import *
+from .src.ensemble import *
+from .src.checkpoint import *
+from .src.batch_swaps import *
+from .src.disk_cache import *
+from .src.extreme_cache import *
+from .src.sweep import *
+from .src.profiling import *
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+Incremental degree assortativity for graphs with a fixed degree sequence.
+
+@author: shane
+"""
+
+import math
+import numpy as np
+import networkx as nx
+
+
+class AssortativityTracker:
+    """
+    Keeps the sufficient statistics of the degree assortativity of a graph,
+    using the degrees the nodes had when the tracker was created. As long as
+    the rewiring preserves the degree sequence, r can then be updated in
+    O(sample_size) when edges are removed or added instead of recomputing
+    it over every edge.
+
+    The statistics are, summed over the undirected edges (j, k):
+        sum_jk : j*k
+        sum_j  : j + k
+        sum_j2 : j**2 + k**2
+
+    All three are integers, so the running sums never drift.
+
+    Parameters
+    ----------
+    G : CompactGraph or networkx.Graph
+        graph whose edges initialise the statistics
+
+    degree : array-like or dict, optional
+        fixed degree of each node, kept as an int64 array for a
+        CompactGraph and as a dict for a networkx.Graph. The default is the
+        current degree in G
+    """
+
+    def __init__(self, G, degree=None):
+        self.m = 0
+        self.sum_jk = 0
+        self.sum_j = 0
+        self.sum_j2 = 0
+        if isinstance(G, nx.Graph):
+            self.degree = dict(G.degree()) if degree is None else degree
+            self.add_edges(G.edges())
+        else:
+            self.degree = np.array(G.degree if degree is None else degree, dtype=np.int64)
+            self.add_edge_array(G.edge_array())
+
+    def add_edge_array(self, edges):
+        """
+        Adds an (E, 2) array of node indices to the statistics in one
+        vectorised pass
+        """
+        j = self.degree[edges[:, 0]]
+        k = self.degree[edges[:, 1]]
+        self.m += len(edges)
+        self.sum_jk += int(np.dot(j, k))
+        self.sum_j += int(j.sum() + k.sum())
+        self.sum_j2 += int(np.dot(j, j) + np.dot(k, k))
+
+    def remove_edge_array(self, edges):
+        """
+        Removes an (E, 2) array of node indices from the statistics in one
+        vectorised pass
+        """
+        j = self.degree[edges[:, 0]]
+        k = self.degree[edges[:, 1]]
+        self.m -= len(edges)
+        self.sum_jk -= int(np.dot(j, k))
+        self.sum_j -= int(j.sum() + k.sum())
+        self.sum_j2 -= int(np.dot(j, j) + np.dot(k, k))
+
+    def add_edges(self, edges):
+        """
+        Adds edges to the statistics
+        """
+        deg = self.degree.item if isinstance(self.degree, np.ndarray) else self.degree.__getitem__
+        for u, v in edges:
+            j = deg(u)
+            k = deg(v)
+            self.m += 1
+            self.sum_jk += j*k
+            self.sum_j += j + k
+            self.sum_j2 += j*j + k*k
+
+    def remove_edges(self, edges):
+        """
+        Removes edges from the statistics
+        """
+        deg = self.degree.item if isinstance(self.degree, np.ndarray) else self.degree.__getitem__
+        for u, v in edges:
+            j = deg(u)
+            k = deg(v)
+            self.m -= 1
+            self.sum_jk -= j*k
+            self.sum_j -= j + k
+            self.sum_j2 -= j*j + k*k
+
+    def r_after(self, removed, added):
+        """
+        The assortativity the tracked edges would have after removing and
+        adding the given edges, leaving the statistics unchanged
+        """
+        saved = (self.m, self.sum_jk, self.sum_j, self.sum_j2)
+        self.remove_edges(removed)
+        self.add_edges(added)
+        r = self.r
+        self.m, self.sum_jk, self.sum_j, self.sum_j2 = saved
+        return r
+
+    def shift_jk(self, delta):
+        """
+        Adds delta to sum_jk, for swaps that leave every degree as it was
+        """
+        self.sum_jk += int(delta)
+
+    def delta_r(self, delta_jk):
+        """
+        Change in r made by changing sum_jk by delta_jk, the other statistics
+        staying as they are. Works elementwise on arrays
+        """
+        mean = self.sum_j/(2*self.m)
+        return delta_jk/(self.m*(self.sum_j2/(2*self.m) - mean**2))
+
+    def sum_jk_at(self, r):
+        """
+        The value of sum_jk at which the tracked edges would have
+        assortativity r, the other statistics staying as they are
+        """
+        mean = self.sum_j/(2*self.m)
+        var = self.sum_j2/(2*self.m) - mean**2
+        return self.m*(r*var + mean**2)
+
+    @property
+    def r(self):
+        """
+        Degree assortativity coefficient of the tracked edges
+        """
+        if self.m == 0:
+            return float('nan')
+        mean = self.sum_j/(2*self.m)
+        var = self.sum_j2/(2*self.m) - mean**2
+        if var == 0:
+            return float('nan')
+        return (self.sum_jk/self.m - mean**2)/var
+
+    def audit(self, G, tol=1e-9):
+        """
+        Compares the tracked value against networkx.
+
+        Parameters
+        ----------
+        G : CompactGraph or networkx.Graph
+            graph the tracker is supposed to describe
+
+        tol : float
+            largest absolute difference accepted
+
+        Returns
+        -------
+        r : float
+            the exact assortativity of G
+
+        Raises
+        ------
+        RuntimeError
+            if the tracked value and the exact value differ by more than tol
+        """
+        if not isinstance(G, nx.Graph):
+            G = G.to_networkx()
+        exact = nx.degree_assortativity_coefficient(G)
+        tracked = self.r
+        if math.isnan(exact) and math.isnan(tracked):
+            return exact
+        if not abs(exact - tracked) <= tol:
+            raise RuntimeError('assortativity tracker out of sync: tracked r = {}, exact r = {}'.format(tracked, exact))
+        return exact
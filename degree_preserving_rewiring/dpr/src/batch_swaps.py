@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+Vectorised double edge swaps, proposed and checked thousands at a time.
+
+@author: shane
+"""
+
+import numpy as np
+
+
+def propose_swaps(G, n_swaps, assortative, draws):
+    """
+    Proposes n_swaps independent double edge swaps on G and drops the ones
+    that cannot be made, all with array operations.
+
+    Each swap takes two edges, sorts their four nodes by degree and pairs
+    them as positively_rewire (assortative) or negatively_rewire does with
+    a sample_size of 2. A swap is dropped if one of its edges is also drawn
+    by another swap, if it would not change r, if a new edge is a self edge
+    or is also proposed by another swap, or if a new edge already exists,
+    which is the only check made edge by edge. Swaps sharing nodes are
+    kept, as each one preserves the degrees on its own. The survivors can
+    therefore all be committed together.
+
+    Parameters
+    ----------
+    G : CompactGraph
+        graph to propose swaps on
+
+    n_swaps : int
+        number of swaps to propose
+
+    assortative : bool
+        pair the nodes to increase r if True, to decrease it if False
+
+    draws : numpy.random.Generator
+        source of randomness
+
+    Returns
+    -------
+    slots : np.ndarray of shape (k, 2)
+        positions in the edge array of the two edges of each surviving swap
+
+    new_edges : np.ndarray of shape (k, 2, 2)
+        the two edges replacing them
+
+    delta_jk : np.ndarray of shape (k,)
+        change in the sum of j*k over the edges made by each swap
+
+    counts : dict
+        numbers of 'self_edges', 'existing_edges' and 'duplicate_edges'
+        proposed, counted as check_new_edges does
+
+    """
+    counts = {'self_edges': 0, 'existing_edges': 0, 'duplicate_edges': 0}
+    if G.size < 2:
+        return np.empty((0, 2), dtype=np.int64), np.empty((0, 2, 2), dtype=np.int64), np.empty(0, dtype=np.int64), counts
+
+    slots = draws.integers(0, G.size, size=(n_swaps, 2))
+    slots = slots[~repeated(slots.ravel()).reshape(-1, 2).any(axis=1)]
+
+    nodes = G.edges[slots].reshape(-1, 4).astype(np.int64)
+    degree = G.degree[nodes]
+    old_jk = degree[:, 0]*degree[:, 1] + degree[:, 2]*degree[:, 3]
+    order = np.argsort(degree, axis=1, kind='stable')
+    nodes = np.take_along_axis(nodes, order, axis=1)
+    degree = np.take_along_axis(degree, order, axis=1)
+    if assortative:
+        pairing = [0, 1, 2, 3]
+    else:
+        pairing = [0, 3, 1, 2]
+    nodes = nodes[:, pairing]
+    degree = degree[:, pairing]
+    delta_jk = degree[:, 0]*degree[:, 1] + degree[:, 2]*degree[:, 3] - old_jk
+
+    #swaps that leave r as it is cannot help reach the target
+    moves = delta_jk != 0
+    slots, nodes, delta_jk = slots[moves], nodes[moves], delta_jk[moves]
+    new_edges = nodes.reshape(-1, 2, 2)
+    lo = new_edges.min(axis=2)
+    hi = new_edges.max(axis=2)
+    self_edges = lo == hi
+    keys = lo*G.n_nodes + hi
+    duplicates = repeated(keys.ravel()).reshape(-1, 2) & ~self_edges
+    exists = np.zeros(keys.shape, dtype=bool)
+    check = ~(self_edges | duplicates)
+    exists[check] = G.has_edges(keys[check])
+
+    counts['self_edges'] = int(self_edges.sum())
+    counts['existing_edges'] = int(exists.sum())
+    counts['duplicate_edges'] = 0.5*int(duplicates.sum())
+    keep = ~(self_edges | exists | duplicates).any(axis=1)
+    return slots[keep], new_edges[keep], delta_jk[keep], counts
+
+
+def repeated(values):
+    """
+    Boolean mask of the entries of a 1d array whose value appears in it
+    more than once
+    """
+    order = np.argsort(values, kind='stable')
+    ordered = values[order]
+    same = ordered[1:] == ordered[:-1]
+    mask = np.zeros(len(values), dtype=bool)
+    mask[order[1:][same]] = True
+    mask[order[:-1][same]] = True
+    return mask
+
+
+def commit_swaps(G, slots, new_edges):
+    """
+    Makes the swaps returned by propose_swaps, replacing the edges in slots
+    with new_edges in place
+
+    Parameters
+    ----------
+    G : CompactGraph
+        graph the swaps were proposed on, unchanged since
+
+    slots : np.ndarray of shape (k, 2)
+        positions of the edges to replace
+
+    new_edges : np.ndarray of shape (k, 2, 2)
+        the edges replacing them
+    """
+    G.replace_edge_array(slots.ravel(), new_edges.reshape(-1, 2))
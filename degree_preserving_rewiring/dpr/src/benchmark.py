@@ -0,0 +1,325 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks of rewire across graph kinds, sizes, methods and sample sizes,
+saved as JSON and compared against a stored baseline.
+
+Run from the command line with
+    python -m degree_preserving_rewiring.dpr.src.benchmark --out bench.json
+and, to fail on regressions against an earlier run,
+    python -m degree_preserving_rewiring.dpr.src.benchmark --out new.json --baseline bench.json
+
+@author: shane
+"""
+
+import sys
+import json
+import time
+import argparse
+import platform
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from .assortativity import AssortativityTracker
+from .compact_graph import CompactGraph
+from .rewiring_functions import rewire
+
+BENCHMARK_GRAPHS = ('er', 'weibull', 'lognormal')
+BENCHMARK_SIZES = (1000, 10000, 100000, 1000000)
+BENCHMARK_METHODS = ('new', 'original', 'max')
+BENCHMARK_SAMPLE_SIZES = (2, 8, 32)
+
+#measures compared by compare_benchmarks, and whether larger values are better
+BENCHMARK_MEASURES = {'time': False, 'iterations_per_second': True, 'peak_rss_mb': False}
+
+
+def benchmark_graph(kind, n, mean_degree=5, seed=0):
+    """
+    Seeded random graph for the benchmarks, built as an edge array so that
+    graphs of a million nodes take seconds
+
+    Parameters
+    ----------
+    kind : str
+        'er' : Erdos-Renyi graph with n*mean_degree/2 edges drawn uniformly
+
+        'weibull' : configuration model with Weibull degrees of scale 2.1
+        and shape 0.48, rounded up, as in generate_weibull
+
+        'lognormal' : configuration model with lognormal degrees of
+        parameters 1.4 and 0.6, rounded up, as in generate_lognormal
+
+    n : int
+        number of nodes
+
+    mean_degree : float
+        mean degree of 'er'. The default is 5, about that of the other two
+
+    seed : int
+        seed of the numpy.random.Generator the graph is drawn from
+
+    Returns
+    -------
+    edges : np.ndarray
+        (E, 2) array of node indices without self edges or duplicates
+    """
+    draws = np.random.default_rng(seed)
+    if kind == 'er':
+        edges = draws.integers(0, n, size=(int(n*mean_degree/2), 2))
+    else:
+        if kind == 'weibull':
+            degrees = np.ceil(2.1*draws.weibull(0.48, n))
+        elif kind == 'lognormal':
+            degrees = np.ceil(draws.lognormal(1.4, 0.6, n))
+        else:
+            raise ValueError("kind must be 'er', 'weibull' or 'lognormal'")
+        degrees = np.minimum(degrees, n - 1).astype(np.int64)
+        degrees[0] += degrees.sum() % 2
+        stubs = np.repeat(np.arange(n), degrees)
+        draws.shuffle(stubs)
+        edges = stubs.reshape(-1, 2)
+    #as nx.Graph(nx.configuration_model(x)) with self loops removed
+    edges = np.sort(edges, axis=1)
+    edges = edges[edges[:, 0] != edges[:, 1]]
+    return np.unique(edges, axis=0)
+
+
+def peak_rss_mb():
+    """
+    Peak resident set size of this process in MB, None where the resource
+    module is not available
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    #bytes on macOS, kilobytes elsewhere
+    return peak/2**20 if sys.platform == 'darwin' else peak/2**10
+
+
+def run_case(kind, n, method, sample_size, target, seed, time_limit):
+    """
+    Builds one benchmark graph and rewires it, timing only the rewiring
+
+    Returns
+    -------
+    case : dict
+        the parameters of the case with
+        time : seconds taken by rewire
+        iterations : iterations of the summary row
+        iterations_per_second : iterations/time
+        edges_rewired : total edges rewired
+        r_start, r : assortativity before and after
+        reached : whether r got to the target. Always True for 'max'
+        peak_rss_mb : peak resident set size of the process
+    """
+    edges = benchmark_graph(kind, n, seed=seed)
+    r_start = AssortativityTracker(CompactGraph.from_graph(edges)).r
+    start = time.perf_counter()
+    summary = rewire(edges, target, kind, sample_size=sample_size, method=method, return_type='summary',
+                     timed=True, time_limit=time_limit, seed=seed)
+    elapsed = time.perf_counter() - start
+    row = summary.iloc[-1]
+    r = float(row['r'])
+    case = {'graph': kind, 'n': n, 'edges': len(edges), 'method': method, 'sample_size': sample_size,
+            'target': target, 'seed': seed,
+            'time': elapsed,
+            'iterations': int(row['iteration']),
+            'iterations_per_second': int(row['iteration'])/elapsed if elapsed > 0 else None,
+            'edges_rewired': int(row['edges_rewired']),
+            'r_start': r_start,
+            'r': r,
+            'reached': method == 'max' or abs(r - target) <= 0.01,
+            'peak_rss_mb': peak_rss_mb()}
+    return case
+
+
+def case_key(case):
+    return (case['graph'], case['n'], case['method'], case['sample_size'], case['target'])
+
+
+def scaling_exponents(cases):
+    """
+    Fits time ~ n**b for every graph kind, method and sample size over the
+    sizes benchmarked, leaving out the cases that did not reach the target
+
+    Returns
+    -------
+    list of dict
+        'graph', 'method', 'sample_size', 'exponent' b of the least squares
+        fit of log(time) against log(n), and 'sizes' used. Groups with fewer
+        than two sizes are left out
+    """
+    groups = {}
+    for case in cases:
+        if not case['reached']:
+            continue
+        groups.setdefault((case['graph'], case['method'], case['sample_size']), []).append(case)
+    exponents = []
+    for (kind, method, sample_size), group in groups.items():
+        sizes = sorted({case['n'] for case in group})
+        if len(sizes) < 2:
+            continue
+        n = np.array([case['n'] for case in group], dtype=float)
+        t = np.array([max(case['time'], 1e-9) for case in group])
+        exponent = np.polyfit(np.log(n), np.log(t), 1)[0]
+        exponents.append({'graph': kind, 'method': method, 'sample_size': sample_size,
+                          'exponent': float(exponent), 'sizes': sizes})
+    return exponents
+
+
+def run_benchmarks(graphs=BENCHMARK_GRAPHS, sizes=BENCHMARK_SIZES, methods=BENCHMARK_METHODS,
+                   sample_sizes=BENCHMARK_SAMPLE_SIZES, target=0.2, seed=0, time_limit=60,
+                   isolate=True, path=None, verbose=False):
+    """
+    Runs every combination of graph kind, size, method and sample size
+
+    Parameters
+    ----------
+    graphs, sizes, methods, sample_sizes : lists
+        what to benchmark. 'max' ignores the sample size and is run once
+        per graph
+
+    target : float
+        target assortativity. The default is 0.2
+
+    seed : int
+        seed of the graphs and of rewire
+
+    time_limit : float
+        time limit of the fine tuning phase of each case. Cases that run
+        out of time are recorded with reached False
+
+    isolate : bool
+        run each case in a fresh process, so that peak_rss_mb is that of
+        the case alone. The default is True
+
+    path : str, optional
+        file to save the results to as JSON
+
+    verbose : bool
+        print each case as it finishes
+
+    Returns
+    -------
+    dict
+        'meta' : versions, platform and settings of the run
+        'cases' : one dict per case, see run_case
+        'scaling' : see scaling_exponents
+
+    """
+    runs = []
+    for kind in graphs:
+        for n in sizes:
+            for method in methods:
+                for sample_size in (sample_sizes[:1] if method == 'max' else sample_sizes):
+                    runs.append((kind, n, method, sample_size, target, seed, time_limit))
+
+    cases = []
+    for args in runs:
+        if isolate:
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                case = pool.submit(run_case, *args).result()
+        else:
+            case = run_case(*args)
+        if verbose:
+            print('{graph} n={n} {method} sample_size={sample_size}: {time:.3f}s, {iterations} iterations, '
+                  'r={r:.4f}, peak RSS {peak_rss_mb} MB'.format(**case), flush=True)
+        cases.append(case)
+
+    report = {'meta': {'python': platform.python_version(),
+                       'numpy': np.__version__,
+                       'platform': platform.platform(),
+                       'processor': platform.processor(),
+                       'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                       'target': target,
+                       'seed': seed,
+                       'time_limit': time_limit,
+                       'isolate': isolate},
+              'cases': cases,
+              'scaling': scaling_exponents(cases)}
+    if path is not None:
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=1)
+    return report
+
+
+def compare_benchmarks(current, baseline, tolerance=0.2):
+    """
+    Compares two runs of run_benchmarks, case by case
+
+    Parameters
+    ----------
+    current, baseline : dict or str
+        reports returned by run_benchmarks, or the JSON files they were
+        saved to
+
+    tolerance : float
+        relative change allowed before a measure counts as a regression.
+        The default is 0.2, i.e. 20% slower or larger
+
+    Returns
+    -------
+    list of dict
+        one per regression, with the case parameters, 'measure',
+        'baseline' and 'current' values and their 'ratio'. A case that
+        reached its target in the baseline and not now is reported with
+        measure 'reached'. Cases only in one of the runs are ignored
+
+    """
+    if isinstance(current, str):
+        with open(current) as f:
+            current = json.load(f)
+    if isinstance(baseline, str):
+        with open(baseline) as f:
+            baseline = json.load(f)
+    before = {case_key(case): case for case in baseline['cases']}
+    regressions = []
+    for case in current['cases']:
+        old = before.get(case_key(case))
+        if old is None:
+            continue
+        where = {'graph': case['graph'], 'n': case['n'], 'method': case['method'], 'sample_size': case['sample_size']}
+        if old['reached'] and not case['reached']:
+            regressions.append(dict(where, measure='reached', baseline=True, current=False, ratio=None))
+        for measure, larger_is_better in BENCHMARK_MEASURES.items():
+            if not old.get(measure) or case.get(measure) is None:
+                continue
+            ratio = case[measure]/old[measure]
+            if (ratio < 1/(1 + tolerance)) if larger_is_better else (ratio > 1 + tolerance):
+                regressions.append(dict(where, measure=measure, baseline=old[measure], current=case[measure], ratio=ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--graphs', nargs='+', default=list(BENCHMARK_GRAPHS))
+    parser.add_argument('--sizes', nargs='+', type=int, default=list(BENCHMARK_SIZES))
+    parser.add_argument('--methods', nargs='+', default=list(BENCHMARK_METHODS))
+    parser.add_argument('--sample-sizes', nargs='+', type=int, default=list(BENCHMARK_SAMPLE_SIZES))
+    parser.add_argument('--target', type=float, default=0.2)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--time-limit', type=float, default=60)
+    parser.add_argument('--no-isolate', action='store_true', help='run every case in this process')
+    parser.add_argument('--out', help='JSON file to save the results to')
+    parser.add_argument('--baseline', help='JSON file of an earlier run to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.graphs, args.sizes, args.methods, args.sample_sizes, args.target, args.seed,
+                            args.time_limit, not args.no_isolate, args.out, verbose=True)
+    for fit in report['scaling']:
+        print('{graph} {method} sample_size={sample_size}: time ~ n^{exponent:.2f}'.format(**fit))
+    if args.baseline is None:
+        return 0
+    regressions = compare_benchmarks(report, args.baseline, args.tolerance)
+    for reg in regressions:
+        print('REGRESSION {graph} n={n} {method} sample_size={sample_size}: {measure} {baseline} -> {current}'.format(**reg))
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
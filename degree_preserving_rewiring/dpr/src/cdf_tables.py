@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+Cumulative degree distributions used by the graph generators, built in one
+vectorised pass and cached by distribution and parameters.
+
+@author: shane
+"""
+
+import numpy as np
+
+from .disk_cache import DiskCache
+
+CDF_DISTRIBUTIONS = ('weibull', 'lognormal', 'exponential')
+
+#degrees 1, ..., CDF_DEGREES - 1 are tabulated
+CDF_DEGREES = 5000
+
+#terms of the truncated tail sums of the weibull and lognormal tables
+CDF_TERMS = 1000
+
+
+def degree_pmf(distribution, params, k):
+    """
+    Unnormalised probability of the degrees k under the generators'
+    weibull or lognormal distribution
+    """
+    if distribution == 'weibull':
+        return ((k/params[0])**(params[1]-1))*np.exp(-((k/params[0])**params[1]))
+    if distribution == 'lognormal':
+        return (1.0/k)*np.exp(-((np.log(k)-params[0])**2)/(2*(params[1]**2)))
+    raise ValueError("distribution must be 'weibull' or 'lognormal'")
+
+
+def build_cdf(distribution, params):
+    """
+    Cumulative probabilities of the degrees 1, ..., CDF_DEGREES - 1
+
+    For 'weibull' and 'lognormal' the tail probability of degree j is the
+    sum of the pmf over j, ..., j + CDF_TERMS - 1, divided by that of
+    degree 1. These window sums are differences of one suffix sum of the
+    pmf, so the table costs O(CDF_DEGREES + CDF_TERMS) rather than a sum
+    per degree. Summing from the end keeps the small tail probabilities
+    accurate. For 'exponential' the tail probability of degree j is
+    exp(-(j - 1)/params[0])
+
+    Parameters
+    ----------
+    distribution : str
+        'weibull', 'lognormal' or 'exponential'
+
+    params : sequence of float
+        parameters of the distribution, as passed to the generators
+
+    Returns
+    -------
+    cdf : np.ndarray
+        cdf[i] is the probability of a degree of at most i
+    """
+    Input = np.arange(1, CDF_DEGREES)
+    if distribution == 'exponential':
+        y = np.exp((-1/params[0])*(Input-1))
+    else:
+        k = np.arange(1, CDF_DEGREES + CDF_TERMS - 1)
+        suffix = np.zeros(len(k) + 1)
+        suffix[:-1] = np.cumsum(degree_pmf(distribution, params, k)[::-1])[::-1]
+        sum1 = suffix[Input - 1] - suffix[Input - 1 + CDF_TERMS]
+        y = sum1/sum1[0]
+    return 1 - y
+
+
+class CDFCache(DiskCache):
+    """
+    Least recently used cache of the tables built by build_cdf, keyed by
+    the distribution and its parameters. Tables are saved as <key>.npy.
+
+    Parameters
+    ----------
+    maxsize : int
+        number of tables kept in memory. The default is 32
+
+    path : str, optional
+        directory the tables are also saved in, see DiskCache
+
+    disk_maxsize : int
+        number of tables kept in path. The default is 256
+    """
+
+    def __init__(self, maxsize=32, path=None, disk_maxsize=256):
+        super().__init__(maxsize, path, disk_maxsize)
+
+    @staticmethod
+    def key(distribution, params):
+        """
+        Hex digest identifying a distribution and its parameters
+        """
+        params = np.atleast_1d(np.asarray(params, dtype=np.float64))
+        return DiskCache.digest(distribution.encode(), params.tobytes(),
+                                np.array([CDF_DEGREES, CDF_TERMS]).tobytes())
+
+    def _save(self, f, cdf):
+        np.save(f, cdf)
+
+    def _load(self, file):
+        return np.load(file)
+
+    def get(self, distribution, params):
+        """
+        The table of the distribution, built and stored if it is not cached
+
+        Returns
+        -------
+        cdf : np.ndarray
+            read-only table, see build_cdf
+        """
+        key = self.key(distribution, params)
+        cdf = self.lookup(key)
+        if cdf is None:
+            cdf = build_cdf(distribution, params)
+            self.store(key, cdf)
+        cdf.flags.writeable = False
+        return cdf
+
+
+#cache used by cdf_table unless it is given one. Set its path to keep the
+#tables on disk between processes
+CDF_CACHE = CDFCache()
+
+
+def cdf_table(distribution, params, cache=None):
+    """
+    Cached table of the cumulative probabilities of the degrees 1, ...,
+    CDF_DEGREES - 1, see build_cdf
+
+    Parameters
+    ----------
+    distribution : str
+        'weibull', 'lognormal' or 'exponential'
+
+    params : sequence of float
+        parameters of the distribution
+
+    cache : CDFCache, optional
+        cache to look the table up in. The default is CDF_CACHE
+
+    Returns
+    -------
+    cdf : np.ndarray
+        read-only table
+    """
+    if distribution not in CDF_DISTRIBUTIONS:
+        raise ValueError("distribution must be 'weibull', 'lognormal' or 'exponential'")
+    return (CDF_CACHE if cache is None else cache).get(distribution, params)
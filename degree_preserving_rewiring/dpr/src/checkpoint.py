@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+"""
+Periodic checkpoints of the fine tuning phase so that long rewiring runs can
+be resumed after the process is killed.
+
+@author: shane
+"""
+
+import json
+import os
+import time
+import numpy as np
+import networkx as nx
+
+from .compact_graph import CompactGraph
+from .results import ResultsRecorder
+
+
+def graph_kind(graph):
+    """
+    Describes the kind of object a graph was given as, so that the rewired
+    graph can be handed back as the same kind after a resume
+
+    Returns
+    -------
+    dict
+        JSON serialisable description of the graph's type
+    """
+    if isinstance(graph, CompactGraph):
+        return {'kind': 'compact'}
+    if isinstance(graph, nx.Graph):
+        return {'kind': 'networkx'}
+    if isinstance(graph, np.ndarray):
+        return {'kind': 'array', 'dtype': graph.dtype.str}
+    return {'kind': 'sparse', 'class': type(graph).__name__, 'dtype': np.dtype(graph.dtype).str}
+
+
+def empty_graph(kind, G):
+    """
+    Empty object of the kind described by graph_kind for G.to_graph to fill
+    """
+    if kind['kind'] == 'compact':
+        return G
+    if kind['kind'] == 'networkx':
+        graph = nx.Graph()
+        graph.add_nodes_from(range(G.n_nodes) if G.labels is None else G.labels)
+        return graph
+    if kind['kind'] == 'array':
+        return np.empty((0, 2), dtype=kind['dtype'])
+    from scipy import sparse
+    return getattr(sparse, kind['class'])((G.n_nodes, G.n_nodes), dtype=kind['dtype'])
+
+
+class Checkpointer:
+    """
+    Decides when to checkpoint and writes the checkpoints. A checkpoint is
+    an uncompressed .npz file holding the edge array, the random state, the
+    iteration counter and the parameters needed to carry on, written to a
+    temporary file and moved over the previous checkpoint, so a kill
+    mid-write leaves the last complete checkpoint in place.
+
+    The results recorded so far are kept next to it in <path>.rows, one
+    fixed size record per row, and each checkpoint only appends the rows
+    recorded since the one before. The .npz stores how many rows it
+    covers, so rows appended by a checkpoint that was killed before its
+    .npz was moved into place are ignored, and cut off by the next
+    checkpoint. Object columns, such as name, hold the same value in every
+    row of a rewiring and are stored as that value in the metadata. A
+    checkpoint therefore costs time in proportion to the number of edges
+    and the rows recorded since the last one, not to every row recorded.
+
+    Parameters
+    ----------
+    path : str
+        file to write the checkpoints to
+
+    every : int
+        iterations between checkpoints
+
+    seconds : float
+        seconds between checkpoints. If both every and seconds are given a
+        checkpoint is taken when either is reached
+
+    params : dict
+        JSON serialisable parameters stored with every checkpoint, such as
+        the arguments of rewire
+
+    before : np.ndarray
+        sorted degree sequence of the graph before rewiring
+    """
+
+    def __init__(self, path, every=None, seconds=None, params=None, before=None):
+        self.path = path
+        self.every = every
+        self.seconds = seconds
+        self.params = {} if params is None else params
+        self.before = before
+        self.last_iteration = 0
+        self.last_time = time.time()
+        #rows of the results already in the rows file, None until the
+        #first checkpoint of a new run starts the file
+        self.rows_written = None
+
+    def due(self, itr):
+        """
+        Whether a checkpoint should be taken at iteration itr
+        """
+        if self.every and itr - self.last_iteration >= self.every:
+            return True
+        if self.seconds and time.time() - self.last_time >= self.seconds:
+            return True
+        return False
+
+    def save(self, G, rng, itr, results, elapsed, phase):
+        """
+        Writes a checkpoint
+
+        Parameters
+        ----------
+        G : CompactGraph
+            graph being rewired
+
+        rng : random.Random or the random module
+            source of randomness, whose state is saved
+
+        itr : int
+            iteration just completed
+
+        results : ResultsRecorder
+            results recorded so far
+
+        elapsed : float
+            seconds spent in the phase so far
+
+        phase : str
+            'positive', 'negative', 'greedy' or 'anneal', the fine tuning function
+            to resume
+        """
+        record = row_record(results.dtypes)
+        constant = [col for col, dtype in results.dtypes.items() if np.dtype(dtype) == object]
+        self.append_rows(results, record)
+
+        labels = None
+        if G.labels is not None:
+            labels = np.asarray(G.labels)
+            if isinstance(G.labels, list) and (labels.dtype == object or labels.tolist() != G.labels):
+                #only labels numpy cannot hold without changing them are pickled
+                labels = np.asarray(G.labels, dtype=object)
+
+        version, state, gauss = rng.getstate()
+        meta = dict(self.params, iteration=itr, elapsed=elapsed, phase=phase,
+                    n_nodes=G.n_nodes, labels_list=isinstance(G.labels, list), rng_version=version, rng_gauss=gauss,
+                    columns=list(results.dtypes), rows=self.rows_written,
+                    record=[list(field) for field in record.descr],
+                    constant={col: plain(results.last_row[col]) for col in constant},
+                    log_state=results.log_state(),
+                    totals={col: np.asarray(value).item() for col, value in results.totals.items()},
+                    last_row={col: plain(results.last_row[col]) for col in results.dtypes})
+        arrays = {'meta': np.array(json.dumps(meta)),
+                  'edges': G.edge_array(),
+                  'rng_state': np.array(state, dtype=np.uint64),
+                  'before': np.asarray(self.before)}
+        if G.labels is not None:
+            arrays['labels'] = labels
+
+        tmp = self.path + '.tmp'
+        with open(tmp, 'wb') as f:
+            np.savez(f, **arrays)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self.last_iteration = itr
+        self.last_time = time.time()
+
+    def append_rows(self, results, record):
+        """
+        Appends the rows recorded since the last checkpoint to the rows
+        file, first cutting off any rows a killed checkpoint left after
+        them
+        """
+        start = 0 if self.rows_written is None else self.rows_written
+        with open(self.path + '.rows', 'wb' if self.rows_written is None else 'r+b') as f:
+            f.truncate(start*record.itemsize)
+            f.seek(start*record.itemsize)
+            rows = np.empty(len(results) - start, dtype=record)
+            for col in record.names:
+                rows[col] = results.column(col)[start:]
+            f.write(rows.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        self.rows_written = len(results)
+
+
+def row_record(dtypes):
+    """
+    Structured dtype of one row of the rows file: every column that is not
+    an object column
+    """
+    return np.dtype([(col, dtype) for col, dtype in dtypes.items() if np.dtype(dtype) != object])
+
+
+def plain(value):
+    """
+    JSON serialisable form of a value of the results
+    """
+    value = np.asarray(value).item()
+    if isinstance(value, (bool, int, float, str)) or value is None:
+        return value
+    return str(value)
+
+
+def load_checkpoint(path):
+    """
+    Reads a checkpoint written by Checkpointer.save
+
+    Returns
+    -------
+    meta : dict
+        the stored parameters, iteration, elapsed time and phase
+
+    G : CompactGraph
+        the graph as it was at the checkpoint
+
+    rng_state : tuple
+        state to pass to random.Random.setstate
+
+    results : ResultsRecorder
+        the results recorded up to the checkpoint
+
+    before : np.ndarray
+        sorted degree sequence of the graph before rewiring
+    """
+    with np.load(path) as data:
+        meta = json.loads(str(data['meta']))
+        labels = None
+        if 'labels' in data:
+            try:
+                labels = data['labels']
+            except ValueError:
+                #labels numpy cannot hold as they are were pickled
+                with np.load(path, allow_pickle=True) as pickled:
+                    labels = pickled['labels']
+            if meta.get('labels_list'):
+                labels = labels.tolist()
+        G = CompactGraph(meta['n_nodes'], data['edges'], labels)
+        rng_state = (meta['rng_version'], tuple(data['rng_state'].tolist()), meta['rng_gauss'])
+        before = data['before']
+
+    record = np.dtype([tuple(field) for field in meta['record']])
+    rows = np.fromfile(path + '.rows', dtype=record, count=meta['rows'])
+    columns = {}
+    for col in meta['columns']:
+        if col in meta['constant']:
+            columns[col] = np.full(meta['rows'], meta['constant'][col], dtype=object)
+        else:
+            columns[col] = rows[col]
+    results = ResultsRecorder.from_columns(columns, meta['totals'])
+    results.set_log_state(meta['log_state'])
+    results.last_row = meta['last_row']
+    return meta, G, rng_state, results, before
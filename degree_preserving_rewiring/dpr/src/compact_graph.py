@@ -0,0 +1,543 @@
+# -*- coding: utf-8 -*-
+"""
+Compact integer graph used by the rewiring functions in place of a
+networkx.Graph.
+
+@author: shane
+"""
+
+import random
+import numpy as np
+import networkx as nx
+
+#largest fraction of the slots of the edge index in use before it doubles
+INDEX_LOAD = 0.5
+
+#odd multiplier of the fibonacci hash spreading the edge keys over the index
+HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+
+WORD = (1 << 64) - 1
+
+
+class CompactGraph:
+    """
+    Undirected graph on the nodes 0, ..., n_nodes - 1 stored as an int32
+    edge array, a degree array and an index giving the position of every
+    edge in the edge array. Edges are identified by the integer key
+    min(u, v)*n_nodes + max(u, v), kept in an int64 array alongside the
+    edge array. The index is an open addressing hash table with linear
+    probing, an int32 array of positions in the edge array with -1 marking
+    free slots, at most INDEX_LOAD full. Removing an edge moves the last
+    edge into its slot, so adding, removing, testing and sampling edges are
+    all O(1) and no list of all edges is ever built. Every structure is a
+    numpy array, so a graph takes about 30 to 35 bytes per edge, against
+    about 250 to 300 for a networkx.Graph.
+
+    Node labels of the graph the CompactGraph was built from are kept in
+    labels and only used by the conversion functions.
+
+    track_degrees sets a reference degree for every node. While tracking,
+    the graph also keeps mismatch, the sum over the nodes of
+    |degree - reference degree|, up to date as edges change, so that
+    degrees_match is O(1). Otherwise degrees_match compares the degree
+    array with the reference in one vectorised pass.
+
+    Parameters
+    ----------
+    n_nodes : int
+        number of nodes
+
+    edges : array-like of shape (E, 2)
+        edges as pairs of node indices. Repeated edges, in either
+        orientation, are only added once
+
+    labels : sequence, optional
+        label of each node index. The default is the indices themselves
+    """
+
+    def __init__(self, n_nodes, edges=(), labels=None):
+        self.n_nodes = int(n_nodes)
+        self.labels = labels
+        self.reference = None
+        self.tracking = False
+        self.mismatch = 0
+        #checks of the degrees made by validate='sampled', see degrees_preserved
+        self.degree_checks = 0
+        self.replace_edges(edges)
+
+    def __len__(self):
+        return self.size
+
+    def __getstate__(self):
+        #memoryviews cannot be pickled, and are made again on unpickling
+        state = self.__dict__.copy()
+        for view in ('_table_view', '_keys_view', '_edges_view'):
+            state.pop(view, None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._views()
+
+    def replace_edges(self, edges):
+        """
+        Replaces every edge with the given (E, 2) array of node indices in one
+        vectorised pass. Repeated edges are only added once
+        """
+        edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+        lo = np.minimum(edges[:, 0], edges[:, 1])
+        hi = np.maximum(edges[:, 0], edges[:, 1])
+        keys, first = np.unique(lo*self.n_nodes + hi, return_index=True)
+        order = np.argsort(first)
+        keys = keys[order]
+        self.size = len(keys)
+        self.edges = np.empty((max(self.size, 1), 2), dtype=np.int32)
+        self.edges[:self.size] = edges[first[order]]
+        self.keys = np.empty(max(self.size, 1), dtype=np.int64)
+        self.keys[:self.size] = keys
+        self._reindex()
+        self._views()
+        self.degree = np.bincount(self.edges[:self.size].ravel(), minlength=self.n_nodes).astype(np.int64)
+        if self.tracking:
+            self.mismatch = int(np.abs(self.degree - self.reference).sum())
+
+    def track_degrees(self, degree=None, tracking=True):
+        """
+        Sets the reference degree of every node, and starts keeping mismatch
+        against it if tracking is True
+
+        Parameters
+        ----------
+        degree : array-like, optional
+            reference degree of each node. The default is the current degree
+
+        tracking : bool
+            keep mismatch up to date. This costs a little on every change
+            of an edge, so it is only worth it where degrees_match is called
+            often
+        """
+        self.reference = self.degree.copy() if degree is None else np.asarray(degree, dtype=np.int64).copy()
+        self.set_tracking(tracking)
+
+    def set_tracking(self, tracking):
+        """
+        Starts or stops keeping mismatch against the reference degrees
+        """
+        self.tracking = tracking
+        if tracking:
+            self.mismatch = int(np.abs(self.degree - self.reference).sum())
+
+    def degrees_match(self):
+        """
+        Whether every node has its reference degree, according to the degree
+        array
+        """
+        if self.tracking:
+            return self.mismatch == 0
+        return bool(np.array_equal(self.degree, self.reference))
+
+    def verify_degrees(self):
+        """
+        Counts the degree of every node from the edge array instead of the
+        degree array, in O(E), and compares them with the reference degrees
+        set by track_degrees
+
+        Returns
+        -------
+        bool
+            whether every node has its reference degree
+        """
+        counted = np.bincount(self.edge_array().ravel(), minlength=self.n_nodes)
+        return bool(np.array_equal(counted, self.reference))
+
+    def _reindex(self, slots=8):
+        #rebuilds the index with at least the given number of slots, placing
+        #every key in vectorised rounds: each round the keys whose current
+        #slot is free take it, one per slot, and the rest move on a slot
+        while slots*INDEX_LOAD < self.size + 1:
+            slots *= 2
+        self.shift = 64 - (slots.bit_length() - 1)
+        self.mask = mask = slots - 1
+        table = np.full(slots, -1, dtype=np.int32)
+        pending = np.arange(self.size)
+        slot = self._home(self.keys[:self.size])
+        while len(pending):
+            free = np.flatnonzero(table[slot] < 0)
+            taken, first = np.unique(slot[free], return_index=True)
+            table[taken] = pending[free[first]]
+            left = np.ones(len(pending), dtype=bool)
+            left[free[first]] = False
+            pending = pending[left]
+            slot = (slot[left] + 1) & mask
+        self.table = table
+        self._table_view = memoryview(table)
+
+    def _views(self):
+        #memoryviews of the index, keys and edges, whose items are read and
+        #written about twice as fast as those of the arrays themselves
+        self._table_view = memoryview(self.table)
+        self._keys_view = memoryview(self.keys)
+        self._edges_view = memoryview(self.edges)
+
+    def _home(self, keys):
+        #first slot of the index probed for each of an array of keys
+        hashed = keys.astype(np.uint64)*np.uint64(HASH_MULTIPLIER)
+        return (hashed >> np.uint64(self.shift)).astype(np.int64)
+
+    def _probe(self, key):
+        #slot of the index holding key and its position in the edge array,
+        #or the free slot ending its probe and -1
+        try:
+            i = ((key*HASH_MULTIPLIER) & WORD) >> self.shift
+        except OverflowError:
+            #a numpy integer, whose product with the multiplier overflows
+            key = int(key)
+            i = ((key*HASH_MULTIPLIER) & WORD) >> self.shift
+        table = self._table_view
+        keys = self._keys_view
+        mask = self.mask
+        while True:
+            pos = table[i]
+            if pos < 0 or keys[pos] == key:
+                return i, pos
+            i = (i + 1) & mask
+
+    def _unindex(self, i):
+        #frees slot i of the index, moving back the later keys of its run
+        #that could no longer be reached, so no free slot breaks a probe
+        table = self._table_view
+        keys = self._keys_view
+        mask = self.mask
+        shift = self.shift
+        table[i] = -1
+        j = i
+        while True:
+            j = (j + 1) & mask
+            pos = table[j]
+            if pos < 0:
+                return
+            home = ((keys[pos]*HASH_MULTIPLIER) & WORD) >> shift
+            if (j - home) & mask >= (j - i) & mask:
+                table[i] = pos
+                table[j] = -1
+                i = j
+
+    def positions(self, keys):
+        """
+        Positions in the edge array of the edges with the given keys, -1 for
+        those that do not exist, looked up in vectorised rounds
+
+        Parameters
+        ----------
+        keys : array-like of int
+            edge keys, see key
+
+        Returns
+        -------
+        np.ndarray
+            positions, of the shape of keys
+        """
+        keys = np.asarray(keys, dtype=np.int64)
+        flat = keys.ravel()
+        found = np.full(len(flat), -1, dtype=np.int64)
+        mask = self.mask
+        pending = np.arange(len(flat))
+        slot = self._home(flat)
+        while len(pending):
+            pos = self.table[slot].astype(np.int64)
+            used = pos >= 0
+            hit = used.copy()
+            hit[used] = self.keys[pos[used]] == flat[pending[used]]
+            found[pending[hit]] = pos[hit]
+            on = used & ~hit
+            pending = pending[on]
+            slot = (slot[on] + 1) & mask
+        return found.reshape(keys.shape)
+
+    def has_edges(self, keys):
+        """
+        Whether the edges with the given keys exist, as a bool array of the
+        shape of keys
+        """
+        return self.positions(keys) >= 0
+
+    def _moved(self, node, step):
+        #updates mismatch after the degree of node changed by step
+        offset = self.degree[node] - self.reference[node]
+        self.mismatch += abs(offset) - abs(offset - step)
+
+    @classmethod
+    def from_networkx(cls, G):
+        """
+        Builds a CompactGraph from a networkx.Graph, numbering the nodes in
+        the order of G.nodes()
+        """
+        labels = list(G.nodes())
+        index = {node: i for i, node in enumerate(labels)}
+        edges = np.fromiter((index[node] for edge in G.edges() for node in edge), dtype=np.int64, count=2*G.number_of_edges())
+        return cls(len(labels), edges, labels)
+
+    @classmethod
+    def from_edge_array(cls, edges):
+        """
+        Builds a CompactGraph from an (E, 2) array of node labels. Only nodes
+        appearing in an edge are represented
+        """
+        edges = np.asarray(edges)
+        labels, inverse = np.unique(edges, return_inverse=True)
+        return cls(len(labels), inverse.reshape(-1, 2), labels)
+
+    @classmethod
+    def from_sparse(cls, A):
+        """
+        Builds a CompactGraph from a symmetric scipy.sparse adjacency matrix,
+        whose row indices are the nodes
+        """
+        from scipy import sparse
+        upper = sparse.triu(A).tocoo()
+        return cls(A.shape[0], np.column_stack((upper.row, upper.col)))
+
+    @classmethod
+    def from_graph(cls, G):
+        """
+        Builds a CompactGraph from a networkx.Graph, an (E, 2) edge array or a
+        scipy.sparse adjacency matrix
+        """
+        if isinstance(G, cls):
+            return G
+        if isinstance(G, nx.Graph):
+            return cls.from_networkx(G)
+        if isinstance(G, np.ndarray):
+            return cls.from_edge_array(G)
+        return cls.from_sparse(G)
+
+    def to_graph(self, like):
+        """
+        Converts back to the kind of object the graph was built from
+
+        Parameters
+        ----------
+        like : networkx.Graph, numpy.ndarray or scipy.sparse matrix
+            the object passed to from_graph. A networkx.Graph has its edges
+            replaced in place
+
+        Returns
+        -------
+        networkx.Graph, numpy.ndarray or scipy.sparse matrix
+            the current edges of the CompactGraph as the same kind of object
+        """
+        if isinstance(like, CompactGraph):
+            return self
+        if isinstance(like, nx.Graph):
+            self.update_networkx(like)
+            return like
+        if isinstance(like, np.ndarray):
+            return self.labelled_edges().astype(like.dtype, copy=False)
+        return type(like)(self.to_sparse()).astype(like.dtype)
+
+    def update_networkx(self, G):
+        """
+        Gives a networkx.Graph, on the labelled nodes, the current edges in
+        place. Only the edges that are gone are removed and only the new
+        ones added, so the edges kept keep their attributes and order
+        """
+        labels = range(self.n_nodes) if self.labels is None else self.labels
+        index = {node: i for i, node in enumerate(labels)}
+        old = np.fromiter((index[node] for edge in G.edges() for node in edge), dtype=np.int64,
+                          count=2*G.number_of_edges()).reshape(-1, 2)
+        new = self.edge_array().astype(np.int64)
+        old_keys = np.minimum(old[:, 0], old[:, 1])*self.n_nodes + np.maximum(old[:, 0], old[:, 1])
+        new_keys = np.minimum(new[:, 0], new[:, 1])*self.n_nodes + np.maximum(new[:, 0], new[:, 1])
+        G.remove_edges_from([(labels[u], labels[v]) for u, v in old[~np.isin(old_keys, new_keys)].tolist()])
+        G.add_edges_from([(labels[u], labels[v]) for u, v in new[~np.isin(new_keys, old_keys)].tolist()])
+
+    def to_networkx(self):
+        """
+        New networkx.Graph with the labelled nodes and current edges
+        """
+        G = nx.Graph()
+        G.add_nodes_from(range(self.n_nodes) if self.labels is None else self.labels)
+        G.add_edges_from(self.labelled_edges().tolist())
+        return G
+
+    def to_sparse(self):
+        """
+        Symmetric scipy.sparse.coo_matrix adjacency of the current edges
+        """
+        from scipy import sparse
+        edges = self.edge_array()
+        rows = np.concatenate((edges[:, 0], edges[:, 1]))
+        cols = np.concatenate((edges[:, 1], edges[:, 0]))
+        return sparse.coo_matrix((np.ones(len(rows), dtype=np.int8), (rows, cols)), shape=(self.n_nodes, self.n_nodes))
+
+    def edge_array(self):
+        """
+        The current edges as a view of the (E, 2) array of node indices
+        """
+        return self.edges[:self.size]
+
+    def labelled_edges(self):
+        """
+        The current edges as an (E, 2) array of node labels
+        """
+        if self.labels is None:
+            return self.edge_array().copy()
+        return np.asarray(self.labels, dtype=object if isinstance(self.labels, list) else None)[self.edge_array()]
+
+    def edge_list(self):
+        """
+        The current edges as a list of tuples of node indices
+        """
+        return list(map(tuple, self.edge_array().tolist()))
+
+    def key(self, u, v):
+        """
+        Integer key of the undirected edge between nodes u and v
+        """
+        if u > v:
+            u, v = v, u
+        return u*self.n_nodes + v
+
+    def has_edge(self, u, v):
+        return self._probe(self.key(u, v))[1] >= 0
+
+    def add_edge(self, u, v):
+        """
+        Adds the edge (u, v). Returns False, without adding anything, if it
+        already exists
+        """
+        key = self.key(u, v)
+        i, pos = self._probe(key)
+        if pos >= 0:
+            return False
+        if self.size == len(self.edges):
+            grown = np.empty((2*len(self.edges), 2), dtype=self.edges.dtype)
+            grown[:self.size] = self.edges[:self.size]
+            self.edges = grown
+            self.keys = np.resize(self.keys, 2*len(self.keys))
+            self._views()
+        edges = self._edges_view
+        edges[self.size, 0] = u
+        edges[self.size, 1] = v
+        self._keys_view[self.size] = key
+        self._table_view[i] = self.size
+        self.size += 1
+        if self.size + 1 > INDEX_LOAD*len(self.table):
+            self._reindex(2*len(self.table))
+        self.degree[u] += 1
+        self.degree[v] += 1
+        if self.tracking:
+            self._moved(u, 1)
+            self._moved(v, 1)
+        return True
+
+    def remove_edge(self, u, v):
+        """
+        Removes the edge (u, v), moving the last edge into its slot
+        """
+        i, pos = self._probe(self.key(u, v))
+        if pos < 0:
+            raise KeyError((u, v))
+        self._unindex(i)
+        last = self.size - 1
+        if pos != last:
+            edges = self._edges_view
+            moved = self._keys_view[last]
+            edges[pos, 0] = edges[last, 0]
+            edges[pos, 1] = edges[last, 1]
+            self._keys_view[pos] = moved
+            self._table_view[self._probe(moved)[0]] = pos
+        self.size = last
+        self.degree[u] -= 1
+        self.degree[v] -= 1
+        if self.tracking:
+            self._moved(u, -1)
+            self._moved(v, -1)
+
+    def replace_edge(self, pos, u, v):
+        """
+        Replaces the edge in slot pos of the edge array with (u, v), which
+        must not already exist, keeping every other edge where it is
+        """
+        edges = self._edges_view
+        a = edges[pos, 0]
+        b = edges[pos, 1]
+        self._unindex(self._probe(self._keys_view[pos])[0])
+        key = self.key(u, v)
+        self._table_view[self._probe(key)[0]] = pos
+        self._keys_view[pos] = key
+        edges[pos, 0] = u
+        edges[pos, 1] = v
+        if not self.tracking:
+            self.degree[a] -= 1
+            self.degree[b] -= 1
+            self.degree[u] += 1
+            self.degree[v] += 1
+            return
+        for node, step in ((a, -1), (b, -1), (u, 1), (v, 1)):
+            self.degree[node] += step
+            self._moved(node, step)
+
+    def replace_edge_array(self, slots, edges):
+        """
+        Replaces the edges in the given distinct slots of the edge array with
+        an (E, 2) array of new edges, none of which may already exist or be
+        repeated
+        """
+        old = self.edges[slots]
+        for key in self.keys[slots].tolist():
+            self._unindex(self._probe(key)[0])
+        edges = np.asarray(edges, dtype=np.int64)
+        lo = np.minimum(edges[:, 0], edges[:, 1])
+        hi = np.maximum(edges[:, 0], edges[:, 1])
+        keys = lo*self.n_nodes + hi
+        self.keys[slots] = keys
+        table = self._table_view
+        for key, pos in zip(keys.tolist(), np.asarray(slots).tolist()):
+            table[self._probe(key)[0]] = pos
+        self.edges[slots] = edges
+        if self.tracking:
+            touched = np.unique(np.concatenate((old.ravel(), edges.ravel())))
+            self.mismatch -= int(np.abs(self.degree[touched] - self.reference[touched]).sum())
+        np.add.at(self.degree, old.ravel(), -1)
+        np.add.at(self.degree, edges.ravel(), 1)
+        if self.tracking:
+            self.mismatch += int(np.abs(self.degree[touched] - self.reference[touched]).sum())
+
+    def add_edges(self, edges):
+        for u, v in edges:
+            self.add_edge(u, v)
+
+    def remove_edges(self, edges):
+        for u, v in edges:
+            self.remove_edge(u, v)
+
+    def clear_edges(self):
+        """
+        Removes every edge, keeping the nodes
+        """
+        self.size = 0
+        self.table[:] = -1
+        self.degree[:] = 0
+        if self.tracking:
+            self.mismatch = int(self.reference.sum())
+
+    def sample_edges(self, k, rng=random):
+        """
+        Samples k distinct edges uniformly at random
+
+        Parameters
+        ----------
+        k : int
+            number of edges to sample
+
+        rng : random.Random
+            source of randomness. The default is the random module
+
+        Returns
+        -------
+        list of tuples
+            the sampled edges as pairs of node indices
+        """
+        edges = self.edges
+        return [tuple(edges[pos].tolist()) for pos in rng.sample(range(self.size), k)]
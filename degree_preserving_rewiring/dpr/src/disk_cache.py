@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+Least recently used cache of numpy entries, kept in memory and optionally
+on disk, shared by the caches of the package.
+
+@author: shane
+"""
+
+import os
+import hashlib
+from collections import OrderedDict
+
+
+class DiskCache:
+    """
+    Least recently used cache of entries keyed by hex digests. Entries are
+    kept in memory and, if a path is given, also saved in that directory as
+    <key><suffix> and looked up there when they are not in memory. Caches
+    with the same path share their entries, across processes too. Files
+    are written to a temporary file and moved into place, so a reader never
+    sees half a file.
+
+    Subclasses set suffix and say how an entry is written to and read from
+    its file with _save and _load.
+
+    Parameters
+    ----------
+    maxsize : int
+        number of entries kept in memory
+
+    path : str, optional
+        directory in which every entry is also saved
+
+    disk_maxsize : int
+        number of entries kept in path. Saving an entry beyond it removes
+        the files least recently used. The default is 256
+    """
+
+    suffix = '.npy'
+
+    def __init__(self, maxsize, path=None, disk_maxsize=256):
+        self.maxsize = maxsize
+        self.path = path
+        self.disk_maxsize = disk_maxsize
+        self.entries = OrderedDict()
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+
+    @staticmethod
+    def digest(*parts):
+        """
+        Hex digest of the given bytes, in order
+        """
+        digest = hashlib.sha1()
+        for part in parts:
+            digest.update(part)
+        return digest.hexdigest()
+
+    def _save(self, f, entry):
+        raise NotImplementedError
+
+    def _load(self, file):
+        raise NotImplementedError
+
+    def _file(self, key):
+        return os.path.join(self.path, key + self.suffix)
+
+    def _remember(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def _evict(self):
+        #removes the files least recently used beyond disk_maxsize
+        files = []
+        for name in os.listdir(self.path):
+            if name.endswith(self.suffix):
+                try:
+                    files.append((os.path.getmtime(os.path.join(self.path, name)), name))
+                except OSError:
+                    pass
+        files.sort()
+        for _, name in files[:max(len(files) - self.disk_maxsize, 0)]:
+            try:
+                os.remove(os.path.join(self.path, name))
+            except OSError:
+                pass
+
+    def lookup(self, key):
+        """
+        The entry stored under key, from memory or from path, or None
+        """
+        entry = self.entries.get(key)
+        if entry is None and self.path is not None:
+            try:
+                entry = self._load(self._file(key))
+            except (OSError, ValueError, KeyError):
+                entry = None
+            else:
+                #marks the file as recently used
+                try:
+                    os.utime(self._file(key))
+                except OSError:
+                    pass
+        if entry is not None:
+            self._remember(key, entry)
+        return entry
+
+    def store(self, key, entry):
+        """
+        Stores entry under key, in memory and in path
+        """
+        self._remember(key, entry)
+        if self.path is not None:
+            os.makedirs(self.path, exist_ok=True)
+            tmp = self._file(key) + '.tmp'
+            with open(tmp, 'wb') as f:
+                self._save(f, entry)
+            os.replace(tmp, self._file(key))
+            self._evict()
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""
+Rewiring many graphs, or many seeds of one graph, on a process pool.
+
+@author: shane
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import numpy as np
+import networkx as nx
+
+#shared memory needs python 3.8. Without it the edges are pickled
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    shared_memory = None
+
+from .compact_graph import CompactGraph
+from .rewiring_functions import rewire
+
+
+def share_edges(edges):
+    """
+    Copies an edge array into a new shared memory block
+
+    Parameters
+    ----------
+    edges : np.ndarray
+        array to be shared
+
+    Returns
+    -------
+    block : multiprocessing.shared_memory.SharedMemory or None
+        the block holding the edges, to be unlinked once no job needs it.
+        None if shared memory is not available, in which case the edges are
+        sent to the workers by pickling
+
+    handle : tuple or np.ndarray
+        (block name, shape, dtype) for rewire_job to attach to, or the edge
+        array itself
+
+    """
+    if shared_memory is None:
+        return None, edges
+    try:
+        block = shared_memory.SharedMemory(create=True, size=max(edges.nbytes, 1))
+    except OSError:
+        return None, edges
+    np.ndarray(edges.shape, dtype=edges.dtype, buffer=block.buf)[:] = edges
+    return block, (block.name, edges.shape, edges.dtype.str)
+
+
+def rewire_job(n_nodes, handle, target, name, seed, kwargs):
+    """
+    Runs rewire on one graph in a worker process
+
+    Parameters
+    ----------
+    n_nodes : int
+        number of nodes of the graph
+
+    handle : tuple or np.ndarray
+        the edges, as returned by share_edges
+
+    target : float
+        target assortativity
+
+    name : str
+        name to appear in the results
+
+    seed : int
+        seed of the job's random stream
+
+    kwargs : dict
+        further arguments to rewire
+
+    Returns
+    -------
+    edges : np.ndarray or None
+        the rewired edges as node indices. None if only the summary is returned
+
+    results : pandas.DataFrame
+        the results returned by rewire
+
+    """
+    if isinstance(handle, tuple):
+        block_name, shape, dtype = handle
+        block = shared_memory.SharedMemory(name=block_name)
+        try:
+            edges = np.ndarray(shape, dtype=dtype, buffer=block.buf).copy()
+        finally:
+            block.close()
+    else:
+        edges = handle
+    G = CompactGraph(n_nodes, edges)
+    if kwargs.get('return_type', 'full') == 'summary':
+        return None, rewire(G, target, name, seed=seed, **kwargs)
+    G, results = rewire(G, target, name, seed=seed, **kwargs)
+    return G.edge_array().copy(), results
+
+
+def rewire_ensemble(graphs_or_factory, targets, method='new', workers=None, seeds=None, names=None, **kwargs):
+    """
+    Rewires every graph to every target assortativity on a process pool and
+    yields the results as the jobs finish.
+
+    Each graph is converted to a CompactGraph once in this process and its
+    edge array placed in shared memory, which every job on that graph
+    copies from, so no networkx objects are pickled. Where shared memory is
+    not available, before python 3.8, the edge array is pickled instead.
+    The workers import the package once, when the pool starts them.
+
+    Parameters
+    ----------
+    graphs_or_factory : list or callable
+        graphs to rewire (networkx.Graph, (E, 2) numpy.ndarray or
+        scipy.sparse matrix), or a function called as
+        graphs_or_factory(seed) for each of seeds to build them
+
+    targets : float or list of floats
+        target assortativities. Every graph is rewired to every target
+
+    method : str
+        method passed to rewire. The default is 'new'
+
+    workers : int
+        number of worker processes. The default is os.cpu_count()
+
+    seeds : int or list of ints
+        with a list of graphs, the root seed all job seeds are spawned from.
+        With a factory, one seed per graph to be built, which is also the
+        root of its jobs' seeds. Each job gets an independent stream spawned
+        with numpy.random.SeedSequence. The default draws fresh entropy
+
+    names : list of str
+        name of each graph in the results. The default is its index
+
+    **kwargs
+        further arguments to rewire, such as sample_size, timed, time_limit
+        and return_type
+
+    Yields
+    ------
+    job : dict
+        'graph' index, 'target' value and 'seed' of the job
+
+    G : networkx.Graph, numpy.ndarray or scipy.sparse matrix
+        the rewired graph, of the kind given. networkx graphs are copied, so
+        the inputs are left as they are. Not yielded when return_type is
+        'summary'
+
+    results : pandas.DataFrame
+        the results of the job, as returned by rewire
+
+    """
+    if np.ndim(targets) == 0:
+        targets = [targets]
+    targets = list(targets)
+    if workers is None:
+        workers = os.cpu_count()
+    summary = kwargs.get('return_type', 'full') == 'summary'
+    kwargs['method'] = method
+
+    if callable(graphs_or_factory):
+        if seeds is None or np.ndim(seeds) == 0:
+            raise ValueError('a graph factory needs a list of seeds, one per graph')
+        graphs = (graphs_or_factory(seed) for seed in seeds)
+        roots = [np.random.SeedSequence(seed) for seed in seeds]
+    else:
+        graphs = iter(graphs_or_factory)
+        roots = np.random.SeedSequence(seeds).spawn(len(graphs_or_factory))
+
+    def jobs():
+        for g, graph in enumerate(graphs):
+            G = CompactGraph.from_graph(graph)
+            block, handle = share_edges(G.edge_array())
+            shared[g] = [block, len(targets), G, graph]
+            name = str(g) if names is None else names[g]
+            for t, child in zip(targets, roots[g].spawn(len(targets))):
+                seed = int(child.generate_state(1, np.uint64)[0])
+                yield {'graph': g, 'target': t, 'seed': seed}, (G.n_nodes, handle, t, name, seed, kwargs)
+
+    #blocks, outstanding jobs and conversion info of each graph still in use
+    shared = {}
+    pending = {}
+    queue = jobs()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        try:
+            while True:
+                for job, args in queue:
+                    pending[pool.submit(rewire_job, *args)] = job
+                    if len(pending) >= 2*workers:
+                        break
+                if not pending:
+                    break
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job = pending.pop(future)
+                    edges, results = future.result()
+                    block, remaining, G, graph = shared[job['graph']]
+                    shared[job['graph']][1] -= 1
+                    if remaining == 1:
+                        del shared[job['graph']]
+                        if block is not None:
+                            block.close()
+                            block.unlink()
+                    if summary:
+                        yield job, results
+                        continue
+                    out = CompactGraph(G.n_nodes, edges, G.labels)
+                    like = graph.copy() if isinstance(graph, nx.Graph) else graph
+                    yield job, out.to_graph(like), results
+        finally:
+            for future in pending:
+                future.cancel()
+            for block, _, _, _ in shared.values():
+                if block is not None:
+                    block.close()
+                    block.unlink()
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+Cache of the most assortative and most disassortative configurations found
+for a degree sequence.
+
+@author: shane
+"""
+
+import numpy as np
+
+from .disk_cache import DiskCache
+
+
+class ExtremeCache(DiskCache):
+    """
+    Least recently used cache of the edge sets built by rewire_positive_full
+    ('max') and rewire_negative_full ('min'), keyed by a hash of the sorted
+    degree sequence and the direction.
+
+    Edges are stored between degree ranks rather than nodes: the nodes of a
+    graph are ranked by degree, ties broken by index, and an edge (u, v) is
+    kept as (rank[u], rank[v]). Any graph with the same degree sequence can
+    then use the configuration, as the node of a given rank always has the
+    same degree.
+
+    Parameters
+    ----------
+    maxsize : int
+        number of configurations kept in memory. The default is 16
+
+    path : str, optional
+        directory the configurations are also saved in, as <key>.npz, see
+        DiskCache
+
+    disk_maxsize : int
+        number of configurations kept in path. The default is 256
+    """
+
+    suffix = '.npz'
+
+    def __init__(self, maxsize=16, path=None, disk_maxsize=256):
+        super().__init__(maxsize, path, disk_maxsize)
+
+    @staticmethod
+    def key(degree, direction):
+        """
+        Hex digest identifying a degree sequence, in any order, and a
+        direction, 'max' or 'min'
+        """
+        return DiskCache.digest(np.sort(np.asarray(degree, dtype=np.int64)).tobytes(), direction.encode())
+
+    def _save(self, f, entry):
+        np.savez(f, ranks=entry[0], r=np.array(entry[1]))
+
+    def _load(self, file):
+        with np.load(file) as data:
+            return data['ranks'], float(data['r'])
+
+    def get(self, G, direction):
+        """
+        The cached configuration for the degree sequence of G
+
+        Parameters
+        ----------
+        G : CompactGraph
+            graph whose degree sequence is looked up
+
+        direction : str
+            'max' or 'min'
+
+        Returns
+        -------
+        edges : np.ndarray or None
+            (E, 2) array of node indices of G, None if nothing is cached
+
+        r : float or None
+            assortativity of the configuration
+
+        """
+        entry = self.lookup(self.key(G.degree, direction))
+        if entry is None:
+            return None, None
+        ranks, r = entry
+        order = np.argsort(G.degree, kind='stable')
+        return order[ranks], r
+
+    def put(self, G, direction, r):
+        """
+        Stores the current edges of G as the configuration for its degree
+        sequence
+
+        Parameters
+        ----------
+        G : CompactGraph
+            graph in the extreme configuration
+
+        direction : str
+            'max' or 'min'
+
+        r : float
+            assortativity of G
+        """
+        key = self.key(G.degree, direction)
+        order = np.argsort(G.degree, kind='stable')
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+        self.store(key, (rank[G.edge_array()].astype(np.int32), float(r)))
+
+
+#cache used when rewire or assortativity_range is given cache=True
+EXTREME_CACHE = ExtremeCache()
@@ -7,9 +7,62 @@ Created on Thu Jul 27 16:05:08 2023
 
 import numpy as np
 from .MLE.MLE_functions import MLE, degree_list
+from .cdf_tables import cdf_table
 import networkx as nx
 
-def generate_graph(distribution, target_mean, size, params='default'):
+def degree_chunks(cdf, size, chunk_size=None):
+    """
+    Draws size degrees from the discrete distribution with the given cdf by
+    inverse transform sampling, in chunks of at most chunk_size
+
+    A uniform val gives the degree i + 1 for the i with
+    cdf[i] <= val < cdf[i + 1], found with one np.searchsorted per chunk
+    rather than a scan of the cdf per draw. Uniforms outside
+    [cdf[0], cdf[-1]) give no degree, so a chunk can be shorter than the
+    number of uniforms drawn for it. The uniforms come from
+    np.random.uniform in the same order whatever the chunk size, so the
+    degrees drawn after np.random.seed do not depend on it
+
+    Parameters
+    ----------
+    cdf : np.ndarray
+        non-decreasing cumulative probabilities of the degrees 1, 2, ...
+
+    size : int
+        number of uniforms to draw
+
+    chunk_size : int, optional
+        number of uniforms drawn at a time. The default is size, all at once
+
+    Yields
+    ------
+    np.ndarray
+        degrees of each chunk
+    """
+    cdf = np.asarray(cdf)
+    if not chunk_size:
+        chunk_size = max(size, 1)
+    for start in range(0, size, chunk_size):
+        pvals = np.random.uniform(0,1, min(chunk_size, size - start))
+        i = np.searchsorted(cdf, pvals, side='right') - 1
+        yield i[(i >= 0) & (i < len(cdf) - 1)] + 1
+
+def sample_degrees(cdf, size, chunk_size=None):
+    """
+    Degree list of size draws from the discrete distribution with the given
+    cdf, see degree_chunks
+
+    Returns
+    -------
+    x : np.ndarray
+        degrees drawn
+    """
+    chunks = list(degree_chunks(cdf, size, chunk_size))
+    if not chunks:
+        return np.zeros(0, dtype=np.int64)
+    return np.concatenate(chunks)
+
+def generate_graph(distribution, target_mean, size, params='default', chunk_size=None):
     """
     Function to call chosen graph generation function from this file
 
@@ -24,6 +77,9 @@ def generate_graph(distribution, target_mean, size, params='default'):
         size:
             the number of nodes desired in the graph
 
+        chunk_size: int, optional
+            number of degrees sampled at a time, see degree_chunks
+
     Returns:
     ---------
         G: networkx.graph
@@ -31,23 +87,23 @@ def generate_graph(distribution, target_mean, size, params='default'):
     """
     if params == 'default':
         if distribution == 'weibull':
-            x, G = generate_weibull(target_mean, size)
+            x, G = generate_weibull(target_mean, size, chunk_size=chunk_size)
         if distribution == 'lognormal':
-            x, G = generate_lognormal(target_mean, size)
+            x, G = generate_lognormal(target_mean, size, chunk_size=chunk_size)
         if distribution == 'exponential':
-            x, G = generate_exponential(target_mean, size)
+            x, G = generate_exponential(target_mean, size, chunk_size=chunk_size)
     else:
         if distribution == 'weibull':
-            x, G = generate_weibull(target_mean, size, params)
+            x, G = generate_weibull(target_mean, size, params, chunk_size)
         if distribution == 'lognormal':
-            x, G = generate_lognormal(target_mean, size, params)
+            x, G = generate_lognormal(target_mean, size, params, chunk_size)
         if distribution == 'exponential':
-            x, G = generate_exponential(target_mean, size, params)
+            x, G = generate_exponential(target_mean, size, params, chunk_size)
     
 
     return G
 
-def generate_weibull(target_mean, size, params = [2.1, 0.48]):
+def generate_weibull(target_mean, size, params = [2.1, 0.48], chunk_size=None):
     """
     Function to generate graph with a weibull distribution
     set p1 = 2.1, p2=0.48 for mean degree of 5
@@ -62,6 +118,8 @@ def generate_weibull(target_mean, size, params = [2.1, 0.48]):
         second distribution parameter.
     size : int
         graph size.
+    chunk_size : int, optional
+        number of degrees sampled at a time, see degree_chunks.
 
     Returns
     -------
@@ -71,28 +129,12 @@ def generate_weibull(target_mean, size, params = [2.1, 0.48]):
         Graph with desired distribution.
 
     """
-    inf = np.arange(1000)
-    Input = [i for i in range(1,5000)]
-    k_min = 1
-    C = 1
-
     dist = None
-    sum1 = np.array([np.sum((((j+inf)/params[0])**(params[1]-1))*np.exp(-(((j+inf)/params[0])**params[1]))) for j in Input])
-    inf_sum = np.sum((((inf + k_min)/params[0])**(params[1]-1)*np.exp(-1*((inf + k_min)/params[0])**params[1])))
-    y = C*sum1/inf_sum
-
-    cdf = 1 - y
+    cdf = cdf_table('weibull', params)
 
 
     while dist != 'Weibull':
-        pvals = np.random.uniform(0,1, size)
-
-        x = []
-        for val in pvals:
-            for i in range(len(cdf) - 1):
-                if val >= cdf[i]:
-                    if val < cdf[i + 1]:
-                        x.append(i + 1)
+        x = sample_degrees(cdf, size, chunk_size).tolist()
         
         try:
             MG = nx.configuration_model(x)
@@ -109,7 +151,7 @@ def generate_weibull(target_mean, size, params = [2.1, 0.48]):
             dist = None
     return x, G        
 
-def generate_lognormal(target_mean, size, params = [1.4, 0.6]):
+def generate_lognormal(target_mean, size, params = [1.4, 0.6], chunk_size=None):
     """
     Function to generate graph with a lognormal distribution
     set p1 = 1.4, p2 = 0.6 for mean degree of 5
@@ -124,6 +166,8 @@ def generate_lognormal(target_mean, size, params = [1.4, 0.6]):
         second distribution parameter.
     size : int
         graph size.
+    chunk_size : int, optional
+        number of degrees sampled at a time, see degree_chunks.
 
     Returns
     -------
@@ -133,28 +177,12 @@ def generate_lognormal(target_mean, size, params = [1.4, 0.6]):
         Graph with desired distribution.
 
     """
-    inf = np.arange(1000)
-    Input = [i for i in range(1,5000)]
-    k_min = 1
-    C = 1
-
     dist = None
-    sum1 = np.array([np.sum( (1.0/(j+inf))*np.exp(-((np.log(j+inf)-params[0])**2)/(2*(params[1]**2)))) for j in Input])
-    inf_sum = np.sum( (1.0/(inf+k_min)) * np.exp(-((np.log(inf+k_min)-params[0])**2)/(2*params[1]**2) ) )
-    y = C*sum1/(inf_sum)  
-
-    cdf = 1 - y
+    cdf = cdf_table('lognormal', params)
 
 
     while dist != 'Lognormal':
-        pvals = np.random.uniform(0,1, size)
-
-        x = []
-        for val in pvals:
-            for i in range(len(cdf) - 1):
-                if val >= cdf[i]:
-                    if val < cdf[i + 1]:
-                        x.append(i + 1)
+        x = sample_degrees(cdf, size, chunk_size).tolist()
         
         try:
             MG = nx.configuration_model(x)
@@ -173,7 +201,7 @@ def generate_lognormal(target_mean, size, params = [1.4, 0.6]):
 
 
 
-def generate_exponential(target_mean, size, params = [4.5]):
+def generate_exponential(target_mean, size, params = [4.5], chunk_size=None):
     """
     Function to generate graph with an exponential distribution
     set p1 = 4.5, for mean degree of 5
@@ -188,6 +216,8 @@ def generate_exponential(target_mean, size, params = [4.5]):
         second distribution parameter.
     size : int
         graph size.
+    chunk_size : int, optional
+        number of degrees sampled at a time, see degree_chunks.
 
     Returns
     -------
@@ -197,26 +227,12 @@ def generate_exponential(target_mean, size, params = [4.5]):
         Graph with desired distribution.
 
     """
-    Input = np.arange(1,5000)
-    k_min = 1
-    C = 1
-
     dist = None
-    y = C*np.exp((-1/params[0])*(Input-k_min))
-        
-    
-    cdf = 1 - y
+    cdf = cdf_table('exponential', params)
 
 
     while dist != 'Exponential':
-        pvals = np.random.uniform(0,1, size)
-
-        x = []
-        for val in pvals:
-            for i in range(len(cdf) - 1):
-                if val >= cdf[i]:
-                    if val < cdf[i + 1]:
-                        x.append(i + 1)
+        x = sample_degrees(cdf, size, chunk_size).tolist()
         
         try:
             MG = nx.configuration_model(x)
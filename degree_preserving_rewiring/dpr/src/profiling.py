@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+Opt-in timing and memory profile of the phases of a rewiring.
+
+@author: shane
+"""
+
+import time
+import tracemalloc
+from collections import defaultdict
+import pandas as pd
+
+
+class Profiler:
+    """
+    Splits the time of a rewiring between its phases with lap timing: each
+    call to lap charges the time since the previous one, measured with
+    time.perf_counter_ns, to the phase named. The rewiring functions call
+    lap at the end of each step of their loops ('sample', 'check',
+    'mutate', 'assortativity', 'log', ...), so every nanosecond between
+    start and the last lap belongs to exactly one phase.
+
+    The number of laps of each phase is counted with its time. Some steps
+    lap a phase more than once per iteration, a rejected sample for example
+    laps 'mutate' once and an accepted one twice.
+
+    Parameters
+    ----------
+    memory : bool
+        also record the peak memory allocated by Python within each phase
+        with tracemalloc, which is started if it is not already tracing.
+        This slows the rewiring down a lot. Before Python 3.9 the peak
+        cannot be reset, and each phase gets the peak since start
+    """
+
+    enabled = True
+
+    def __init__(self, memory=False):
+        self.memory = memory
+        self.times = defaultdict(int)
+        self.laps = defaultdict(int)
+        self.peaks = defaultdict(int)
+        self.last = None
+        #memory traced at the end of the previous lap
+        self.base = 0
+        self.started_tracing = False
+
+    def start(self):
+        """
+        Starts the clock, and tracemalloc if memory is True
+        """
+        if self.memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self.started_tracing = True
+            if hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+            self.base = tracemalloc.get_traced_memory()[0]
+        self.last = time.perf_counter_ns()
+
+    def lap(self, phase):
+        """
+        Charges the time since the previous lap to phase
+        """
+        now = time.perf_counter_ns()
+        self.times[phase] += now - self.last
+        self.laps[phase] += 1
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if peak - self.base > self.peaks[phase]:
+                self.peaks[phase] = peak - self.base
+            if hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+            self.base = current
+            #the tracemalloc calls are not charged to the next phase
+            now = time.perf_counter_ns()
+        self.last = now
+
+    def stop(self):
+        """
+        Stops tracemalloc if start started it
+        """
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+
+    def report(self):
+        """
+        The profile as a pandas.DataFrame
+
+        Returns
+        -------
+        pandas.DataFrame
+            one row per phase, in the order they were first lapped, with
+            columns
+            phase : name of the phase
+            laps : number of laps charged to it
+            time : total seconds
+            share : fraction of the profiled time
+            mean_ns : nanoseconds per lap
+            peak_bytes : largest rise of the memory traced within one lap
+                         above what it was at the start of the lap, only
+                         if memory is True
+        """
+        total = sum(self.times.values())
+        rows = []
+        for phase, ns in self.times.items():
+            row = {'phase': phase,
+                   'laps': self.laps[phase],
+                   'time': ns/1e9,
+                   'share': ns/total if total else 0.0,
+                   'mean_ns': ns/self.laps[phase]}
+            if self.memory:
+                row['peak_bytes'] = self.peaks[phase]
+            rows.append(row)
+        columns = ['phase', 'laps', 'time', 'share', 'mean_ns'] + (['peak_bytes'] if self.memory else [])
+        return pd.DataFrame(rows, columns=columns)
+
+
+class NullProfiler:
+    """
+    Profiler that records nothing, used when profiling is off. Each lap is
+    a call to an empty method
+    """
+
+    enabled = False
+
+    def start(self):
+        pass
+
+    def lap(self, phase):
+        pass
+
+    def stop(self):
+        pass
+
+
+#profiler used by the rewiring functions unless they are given one
+NULL_PROFILER = NullProfiler()
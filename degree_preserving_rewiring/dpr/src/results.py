@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""
+Columnar recorder for the per iteration results of the rewiring functions.
+
+@author: shane
+"""
+
+import math
+import numpy as np
+import pandas as pd
+
+#columns of the results DataFrame returned by rewire and their dtypes
+RESULT_COLUMNS = {'name': object,
+                  'iteration': np.int64,
+                  'time': np.float64,
+                  'r': np.float64,
+                  'target_r': np.float64,
+                  'sample_size': np.int64,
+                  'edges_rewired': np.int64,
+                  'duplicate_edges': np.float64,
+                  'self_edges': np.int64,
+                  'existing_edges': np.int64,
+                  'partial_swaps': np.int64,
+                  'preserved': np.bool_,
+                  'method': np.int64,
+                  'summary': np.int64}
+
+#columns of the DataFrame returned by test_sample_sizes
+SAMPLE_SIZE_COLUMNS = {'name': object,
+                       'sample_size': np.int64,
+                       'duplicate_edges': np.float64,
+                       'self_edges': np.int64,
+                       'existing_edges': np.int64,
+                       'success': np.bool_}
+
+
+#columns whose totals over every appended row are kept exactly, for the summary row
+TOTAL_COLUMNS = ('time', 'edges_rewired', 'duplicate_edges', 'self_edges', 'existing_edges', 'partial_swaps')
+
+#policies deciding which appended rows a ResultsRecorder keeps
+LOG_POLICIES = ('all', 'none', 'every_k', 'log_spaced', 'r_delta')
+
+
+class ResultsRecorder:
+    """
+    Collects result rows in growable NumPy column buffers. Appending a row
+    costs a handful of array assignments, and the pandas.DataFrame is only
+    built once by to_frame.
+
+    Which rows are kept is set by a logging policy. The totals of the
+    TOTAL_COLUMNS and the last row are kept for every row appended, whether
+    or not the row itself is kept, so a summary built from them is exact
+    under any policy. Summary rows are always kept.
+
+    Parameters
+    ----------
+    columns : dict
+        column names mapped to their dtypes. The default is RESULT_COLUMNS
+
+    capacity : int
+        number of rows to allocate up front. Doubled whenever it runs out
+
+    log : str
+        logging policy, one of LOG_POLICIES
+            'all' : keep every row
+
+            'none' : keep only summary rows, memory stays constant
+
+            'every_k' : keep the first row and every log_every-th one after
+
+            'log_spaced' : keep the rows appended at positions
+            ceil(10**(i/log_per_decade)) for i = 0, 1, 2, ..., so rows 1, 2,
+            3, 4, 6, 7, 8, 10, 13, 16, 20, ... for 10 per decade
+
+            'r_delta' : keep a row when its r differs by more than
+            log_epsilon from the r of the last row kept
+
+    log_every : int
+        k of 'every_k'. The default is 100
+
+    log_per_decade : int
+        rows kept per decade by 'log_spaced'. The default is 10
+
+    log_epsilon : float
+        change in r that 'r_delta' records. The default is 1e-3
+    """
+
+    def __init__(self, columns=None, capacity=1024, log='all', log_every=100, log_per_decade=10, log_epsilon=1e-3):
+        if columns is None:
+            columns = RESULT_COLUMNS
+        if log not in LOG_POLICIES:
+            raise ValueError('log must be one of {}'.format(', '.join(LOG_POLICIES)))
+        self.dtypes = dict(columns)
+        self.capacity = max(int(capacity), 1)
+        self.size = 0
+        self.buffers = {col: np.empty(self.capacity, dtype=dtype) for col, dtype in self.dtypes.items()}
+        self.totals = {col: 0 for col in TOTAL_COLUMNS if col in self.dtypes}
+        self.last_row = None
+        self.log = log
+        self.log_every = max(int(log_every), 1)
+        self.log_per_decade = log_per_decade
+        self.log_epsilon = log_epsilon
+        #state of the policy: rows appended, i of the next position
+        #'log_spaced' keeps and r of the last row kept
+        self.appended = 0
+        self.log_step = 0
+        self.logged_r = None
+
+    def __len__(self):
+        return self.size
+
+    @classmethod
+    def from_columns(cls, columns, totals=None):
+        """
+        Builds a recorder holding already recorded rows
+
+        Parameters
+        ----------
+        columns : dict
+            column names mapped to arrays of equal length, as returned by
+            column
+
+        totals : dict, optional
+            totals of the rows appended so far, including rows that were not
+            kept. The default is the totals of the given rows
+
+        Returns
+        -------
+        ResultsRecorder
+            recorder with those rows, ready to be appended to
+        """
+        size = len(next(iter(columns.values())))
+        recorder = cls({col: values.dtype for col, values in columns.items()}, capacity=max(2*size, 1024))
+        for col, values in columns.items():
+            recorder.buffers[col][:size] = values
+        recorder.size = size
+        if totals is None:
+            totals = {col: columns[col].sum().item() for col in recorder.totals}
+        recorder.totals.update(totals)
+        if size:
+            recorder.last_row = {col: values[size - 1] for col, values in columns.items()}
+        recorder.appended = size
+        return recorder
+
+    def log_state(self):
+        """
+        The logging policy and its progress, as a dict of plain values that
+        set_log_state restores
+        """
+        return {'log': self.log, 'log_every': self.log_every, 'log_per_decade': self.log_per_decade,
+                'log_epsilon': self.log_epsilon, 'appended': self.appended, 'log_step': self.log_step,
+                'logged_r': self.logged_r}
+
+    def set_log_state(self, state):
+        """
+        Carries on with the logging policy saved by log_state
+        """
+        for key, value in state.items():
+            setattr(self, key, value)
+
+    def _grow(self):
+        self.capacity *= 2
+        for col, buf in self.buffers.items():
+            grown = np.empty(self.capacity, dtype=buf.dtype)
+            grown[:self.size] = buf[:self.size]
+            self.buffers[col] = grown
+
+    def keeps(self, row):
+        """
+        Whether the logging policy keeps a row about to be appended
+        """
+        if self.log == 'all' or row.get('summary'):
+            return True
+        if self.log == 'none':
+            return False
+        if self.log == 'every_k':
+            return self.appended % self.log_every == 0
+        if self.log == 'log_spaced':
+            position = self.appended + 1
+            if math.ceil(10**(self.log_step/self.log_per_decade)) > position:
+                return False
+            while math.ceil(10**(self.log_step/self.log_per_decade)) <= position:
+                self.log_step += 1
+            return True
+        r = row['r']
+        if self.logged_r is not None and not abs(r - self.logged_r) > self.log_epsilon:
+            return False
+        self.logged_r = float(r)
+        return True
+
+    def append(self, row):
+        """
+        Adds a row, given as a dict with a value for every column. It is
+        counted in the totals and becomes the last row, and is stored if the
+        logging policy keeps it
+        """
+        for col in self.totals:
+            self.totals[col] += row[col]
+        self.last_row = row
+        keep = self.keeps(row)
+        self.appended += 1
+        if not keep:
+            return
+        if self.size == self.capacity:
+            self._grow()
+        i = self.size
+        for col, buf in self.buffers.items():
+            buf[i] = row[col]
+        self.size += 1
+
+    def column(self, col):
+        """
+        The recorded values of a column, as a view on the buffer
+        """
+        return self.buffers[col][:self.size]
+
+    def last(self, col):
+        """
+        The value of a column in the most recent row, kept or not
+        """
+        return self.last_row[col]
+
+    def total(self, col):
+        """
+        The total of one of the TOTAL_COLUMNS over every row appended
+        """
+        return self.totals[col]
+
+    def to_frame(self):
+        """
+        Builds the pandas.DataFrame of all recorded rows
+
+        Returns
+        -------
+        pandas.DataFrame
+            one row per recorded row with the recorder's columns.
+            duplicate_edges is counted in halves, and is returned as
+            integers when every value is whole, as pandas would
+        """
+        data = {}
+        for col in self.dtypes:
+            values = self.column(col).copy()
+            if col == 'duplicate_edges' and np.all(np.mod(values, 1) == 0):
+                values = values.astype(np.int64)
+            data[col] = values
+        return pd.DataFrame(data)
@@ -9,42 +9,192 @@ import networkx as nx
 import numpy as np
 import pandas as pd
 import time
+import math
 import random
+from collections import Counter
+from .assortativity import AssortativityTracker
+from .compact_graph import CompactGraph
+from .results import ResultsRecorder, SAMPLE_SIZE_COLUMNS
+from .checkpoint import Checkpointer, graph_kind, empty_graph, load_checkpoint
+from .batch_swaps import propose_swaps, commit_swaps
+from .extreme_cache import EXTREME_CACHE
+from .profiling import Profiler, NullProfiler, NULL_PROFILER
 
-def rewire(G, target_assortativity, name, sample_size = 2, timed = False, time_limit=600, method='new', return_type = 'full'):
+#number of potential edges from which check_new_edges counts with NumPy
+VECTORISE_FROM = 64
+
+#tolerance of anneal_rewire when it is not given one
+ANNEAL_TOLERANCE = 1e-3
+
+#fraction of the starting temperature at which anneal_rewire stops cooling
+#and gives up on reaching the band
+ANNEAL_FROZEN = 1e-3
+
+#sample sizes tried by tune_sample_size
+SAMPLE_SIZE_CANDIDATES = (2, 4, 8, 16, 32, 64, 128, 256)
+
+#entries of a checkpoint's metadata that are parameters of the run
+CHECKPOINT_PARAMS = ('kind', 'dtype', 'class', 'target_assortativity', 'name', 'sample_size',
+                     'timed', 'time_limit', 'method', 'return_type', 'audit_every', 'tolerance',
+                     'batch_size', 'accept', 'retune_every', 'tune_seconds', 'temperature',
+                     'cooling', 'cooling_every', 'validate')
+
+#ways of checking that the degrees are preserved, from cheapest to most thorough
+VALIDATE_MODES = ('off', 'sampled', 'full')
+
+#checks between the recounts of every degree made by validate='sampled'
+VALIDATE_EVERY = 64
+
+
+def rewire(G, target_assortativity, name, sample_size = 2, timed = False, time_limit=600, method='new', return_type = 'full', audit_every = 0, seed = None, checkpoint_path = None, checkpoint_every = None, checkpoint_seconds = None, tolerance = None, batch_size = None, accept = 'all', retune_every = 0, tune_seconds = 1.0, temperature = None, cooling = 0.95, cooling_every = 1000, cache = None, log = 'all', log_every = 100, log_per_decade = 10, log_epsilon = 1e-3, profile = False, validate = 'off'):
     """
     Parameters
     ----------
 
-    G : networkx.Graph
-        graph to be reiwired
+    G : networkx.Graph, numpy.ndarray of shape (E, 2) or scipy.sparse matrix
+        graph to be reiwired. It is converted to a CompactGraph for the
+        rewiring and node labels are only translated on entry and exit
     target_assortativity : float in range [-1, 1]
         desired value for assortativity
     name: str
         name to appear in results data set
-    sample_size : int
-        number of edges to rewire at each iteration
+    sample_size : int or 'auto'
+        number of edges to rewire at each iteration. For 'greedy', the
+        number of candidate swaps drawn at each iteration. 'auto' picks it
+        with tune_sample_size at the start of the fine tuning phase of
+        'new' and 'original', and the rows recorded before then are given
+        the chosen size. As the choice depends on timings, a seed no longer
+        fixes the run
     timed : bool
         whether or not to impose a maximum time on the algorithm
     time_limit : float
         time limit if the algorithm is timed
     method : string
-        can be 'new', 'old' or 'max'
-            new: method described in paper [ADD REF WHEN AVAILABLE]
+        one of 'new', 'original', 'max', 'greedy' or 'anneal'
+            new: method described in paper [ADD REF WHEN AVAILABLE]. The
+            graph is first rewired to its extreme configuration, then
+            brought back towards the target
 
-            old: original algorithm from Van Meighem et al. (2010)
+            original: original algorithm from Van Meighem et al. (2010)
 
             max: only step one of new version
+
+            greedy: draws sample_size candidate double edge swaps at each
+            iteration, scores the exact change in r of each and applies the
+            best of them
+
+            anneal: Metropolis search on |r - target| over random double
+            edge swaps with a cooling schedule
     return_type: string
-        can be 'full' or 'summarised'
+        can be 'full' or 'summary'
             'full' : returns detailed results at each algorithm iteration
 
-            'summarised': returns only total time taken, total iterations, etc.
+            'summary': returns only total time taken, total iterations, etc.
+    audit_every: int
+        check the incrementally tracked assortativity against
+        networkx.degree_assortativity_coefficient every audit_every
+        iterations of the fine tuning phase. 0 disables the check
+    seed: int
+        seed of the random.Random instance the rewiring draws from. By default
+        the random module is used
+    checkpoint_path: str
+        file to checkpoint the fine tuning phase to, so that the run can be
+        continued with resume_rewire if the process is killed. The results
+        are kept next to it, in checkpoint_path + '.rows'. The default of
+        None never checkpoints
+    checkpoint_every: int
+        iterations between checkpoints
+    checkpoint_seconds: float
+        seconds between checkpoints
+    tolerance: float
+        run the fine tuning phase until r is within tolerance of the target,
+        and reject batches of swaps that would take r past that band,
+        halving the number of edges sampled each time down to a single
+        swap. The default of None runs until r crosses the target, as
+        before
+    batch_size: int
+        for 'new' and 'original', propose batch_size independent double edge
+        swaps at each iteration of the fine tuning phase and commit all of
+        those that can be made together, instead of rewiring sample_size
+        edges as one group. sample_size and accept are then not used. The
+        other methods ignore it. The default of None keeps the grouped
+        rewiring
+    accept: string
+        'all' or 'partial', for the grouped rewiring of the fine tuning
+        phase of 'new' and 'original'. The other methods, and batch_size,
+        ignore it. The default is 'all'
+            'all' : a sample of edges is only rewired if every new edge is
+            valid
+
+            'partial' : the parts of a sample that keep the degrees on their
+            own are rewired even when other parts are invalid
+    retune_every: int
+        run tune_sample_size again every retune_every iterations of the
+        grouped fine tuning, as the acceptance rate drifts. The default of 0
+        never does
+    tune_seconds: float
+        time given to each run of tune_sample_size. The default is 1 second
+    temperature, cooling, cooling_every: float, float, int
+        cooling schedule of 'anneal': the starting temperature, in units of
+        r, and the factor it is multiplied by every cooling_every
+        iterations. cooling must lie strictly between 0 and 1 and
+        cooling_every be at least 1, or a ValueError is raised, as the
+        schedule would otherwise never freeze. 'anneal' runs until r is within tolerance of the target,
+        ANNEAL_TOLERANCE if tolerance is None, or the schedule has frozen.
+        See anneal_rewire
+    cache: ExtremeCache or bool
+        cache of the extreme configurations of degree sequences. When given,
+        the first phase of 'new' and 'max' is taken from the cache if it
+        holds the configuration, and stored in it if not, and a target
+        outside the range given by assortativity_range raises a ValueError
+        before any rewiring. True uses the shared EXTREME_CACHE. The default
+        of None builds the extreme configuration every time
+    log: string
+        which rows of the results are kept, see ResultsRecorder
+            'all' : every row
+
+            'none' : only the summary row
+
+            'every_k' : the first row and every log_every-th one after
+
+            'log_spaced' : log_per_decade logarithmically spaced rows per
+            factor of 10 iterations
+
+            'r_delta' : a row whenever r has moved by more than log_epsilon
+            since the last row kept
+
+        The summary row counts every iteration whichever rows are kept.
+        return_type='summary' always uses 'none'
+    log_every, log_per_decade, log_epsilon: int, int, float
+        settings of the 'every_k', 'log_spaced' and 'r_delta' policies
+    profile: bool, str or Profiler
+        time the phases of the rewiring, and of each iteration of the fine
+        tuning ('sample', 'check', 'mutate', 'assortativity', 'log', ...),
+        with a Profiler. 'memory' also records the peak memory of each
+        phase with tracemalloc, at a large cost in speed. The default of
+        False records nothing and costs an empty method call per phase
+    validate: string
+        how the 'preserved' column is checked
+            'off' : the CompactGraph keeps the distance between the degrees
+            and the starting ones up to date as edges change, and each check
+            is O(1)
+
+            'sampled' : as 'off', and every VALIDATE_EVERY checks, and on
+            the summary row, the degrees are also counted again from the
+            edges, in O(E), so the recounts cost O(E/VALIDATE_EVERY) per
+            check
+
+            'full' : the sorted degree sequence is rebuilt and compared with
+            the starting one at every check, as before
+        The checks are made on the rows of the first phase of 'new' and
+        'max' and on the summary row
 
     Returns:
     --------
-    G : networkx.Graph
-        rewired graph, rewiring done in place
+    G : networkx.Graph, numpy.ndarray or scipy.sparse matrix
+        rewired graph of the same kind as the input. A networkx.Graph is
+        rewired in place, an edge array or sparse matrix is returned new.
+        Not returned if return_type is 'summary'
 
     results : pandas.DataFrame()
         dataframe with all necessary info to plot results
@@ -61,63 +211,328 @@ def rewire(G, target_assortativity, name, sample_size = 2, timed = False, time_l
         duplicate_edges : The number of duplicate edges in the list of potential edges (one edge appearing twice = 1 here)
         self_edges : The number of self edges in the list of potential edges
         existing_edges : The number of edges in the list of potential edges that already exist in the graph
+        partial_swaps : The number of independent parts of a sample rewired when the rest of the sample
+                        was rolled back (accept='partial' only)
         preserved : If the degree_list has been preserved (only present in first and last rows)
         method : The method applied. 0 = none (for info about the starting values)
                                      1 = new method, rewiring_full phase
                                      2 = new method, second phase
+                                     3 = greedy method
+                                     4 = anneal method
         summary : Whether or not the row is a summary of the entire rewiring process for a graph
+
+    profile : pandas.DataFrame
+        only when profiling, the report of the Profiler, see Profiler.report.
+        It comes last, after the results
     
 
     """
 
+    steps = rewire_iter(G, target_assortativity, name, sample_size=sample_size, timed=timed, time_limit=time_limit,
+                        method=method, return_type=return_type, audit_every=audit_every, seed=seed,
+                        checkpoint_path=checkpoint_path, checkpoint_every=checkpoint_every,
+                        checkpoint_seconds=checkpoint_seconds, tolerance=tolerance, batch_size=batch_size,
+                        accept=accept, retune_every=retune_every, tune_seconds=tune_seconds,
+                        temperature=temperature, cooling=cooling, cooling_every=cooling_every, cache=cache,
+                        log=log, log_every=log_every, log_per_decade=log_per_decade, log_epsilon=log_epsilon,
+                        profile=profile, validate=validate)
+    while True:
+        try:
+            next(steps)
+        except StopIteration as done:
+            return done.value
+
+
+
+def rewire_iter(G, target_assortativity, name, sample_size = 2, timed = False, time_limit=600, method='new', return_type = 'full', audit_every = 0, seed = None, checkpoint_path = None, checkpoint_every = None, checkpoint_seconds = None, tolerance = None, batch_size = None, accept = 'all', retune_every = 0, tune_seconds = 1.0, temperature = None, cooling = 0.95, cooling_every = 1000, cache = None, log = 'none', log_every = 100, log_per_decade = 10, log_epsilon = 1e-3, profile = False, validate = 'off', results = None):
+    """
+    Generator version of rewire, for watching r converge or stopping the
+    rewiring on a condition of the caller's own.
+
+    Each iteration yields the row it recorded, a dict with the columns of
+    the results of rewire (iteration, r, edges_rewired, duplicate_edges,
+    self_edges, existing_edges, ...) and 'elapsed', the seconds since the
+    start of the run. The first row describes G before rewiring and the
+    first phase of 'new' and 'max' yields only the row it ends on.
+
+    The graph is rewired as a CompactGraph, which is consistent at every
+    yield: the degree sequence is preserved and r is exact. A CompactGraph
+    passed in is that graph, and can be read between yields. Any other
+    kind of graph is converted, and only written back, or returned, once
+    the rewiring finishes or the generator is closed, so a networkx.Graph
+    passed in keeps its original edges until then; writing it back at
+    every yield would cost O(E) per iteration.
+
+    The generator can be closed, or simply dropped, at any time. A
+    networkx.Graph is then left rewired as far as the rewiring got.
+
+    By default only the totals of the rows and the summary row are kept,
+    so memory does not grow with the number of iterations.
+
+    Parameters
+    ----------
+    as for rewire, with
+
+    log : str
+        logging policy of the results, as for rewire. The default is 'none'
+
+    results : ResultsRecorder, optional
+        recorder the rows are appended to, in place of one made with the
+        log settings
+
+    Yields
+    ------
+    row : dict
+        the row of each iteration
+
+    Returns
+    -------
+    as for rewire, as the value of the StopIteration raised once the target
+    is reached or the time limit runs out
+
+    """
+    if validate not in VALIDATE_MODES:
+        raise ValueError('validate must be one of {}'.format(', '.join(VALIDATE_MODES)))
+    if not 0 < cooling < 1:
+        raise ValueError('cooling must lie strictly between 0 and 1, not {}'.format(cooling))
+    if cooling_every < 1:
+        raise ValueError('cooling_every must be at least 1, not {}'.format(cooling_every))
+    tune = sample_size == 'auto'
+    if tune:
+        if method in ('greedy', 'anneal'):
+            raise ValueError("sample_size='auto' tunes the grouped rewiring of the 'new' and 'original' methods")
+        sample_size = 2
+    run_start = time.time()
+    if isinstance(profile, (Profiler, NullProfiler)):
+        profiler = profile
+    elif profile:
+        profiler = Profiler(memory=profile == 'memory')
+    else:
+        profiler = NULL_PROFILER
+    profiler.start()
+
+    def stamped(row):
+        #adds the seconds since the start of the run to a row about to be yielded
+        row['elapsed'] = time.time() - run_start
+        return row
+
+    def stream(rows):
+        for row in rows:
+            yield stamped(row)
+
+    graph = G
+    G = CompactGraph.from_graph(graph)
+    rng = random if seed is None else random.Random(seed)
+    tracker = AssortativityTracker(G)
+    profiler.lap('convert')
     first_row = {'name':name,
                  'iteration': 0, 
                  'time': 0, 
-                 'r': nx.degree_assortativity_coefficient(G),
+                 'r': tracker.r,
                  'target_r': target_assortativity, 
                  'sample_size': sample_size, 
                  'edges_rewired': 0,
                  'duplicate_edges': 0, 
                  'self_edges': 0,
                  'existing_edges': 0, 
+                 'partial_swaps': 0,
                  'preserved': True,
                  'method': 0,
                  'summary':0}
     
-    results = pd.DataFrame([first_row])
-
-    before = degree_list(G)
-    if nx.degree_assortativity_coefficient(G) < target_assortativity:
-      if method == 'new':
-        G = rewire_positive_full(G, results, name, sample_size, return_type)
-        G = negatively_rewire(G, target_assortativity, name, results, sample_size, timed, time_limit)
-      if method == 'original':
-        G = positively_rewire(G, target_assortativity, name, results, sample_size, timed, time_limit)
-      if method == 'max':
-        G = rewire_positive_full(G, results, name, sample_size, return_type)
-
+    if results is None:
+        if return_type == 'summary':
+            log = 'none'
+        results = ResultsRecorder(log=log, log_every=log_every, log_per_decade=log_per_decade, log_epsilon=log_epsilon)
+    results.append(first_row)
+
+    if cache is True:
+        cache = EXTREME_CACHE
+    if cache:
+        low, high = assortativity_range(G, cache, rng)
+        if (low is not None and target_assortativity < low) or (high is not None and target_assortativity > high):
+            raise ValueError('target assortativity {} is outside the range [{}, {}] reached by the extreme configurations of this degree sequence'.format(target_assortativity, low, high))
+        profiler.lap('range')
+
+    if validate == 'full':
+        before = degree_list(G)
     else:
-      if method == 'new':
-        G = rewire_negative_full(G, results, name, sample_size, return_type)
-        G = positively_rewire(G, target_assortativity, name, results, sample_size, timed, time_limit)
-      if method == 'original':
-        G = negatively_rewire(G, target_assortativity, name, results, sample_size, timed, time_limit)
-      if method == 'max':
-        G = rewire_negative_full(G, results, name, sample_size, return_type)
-
-    after = degree_list(G)
+        G.track_degrees(tracking=False)
+        before = G.reference
+    checkpoint = None
+    if checkpoint_path is not None:
+        params = dict(graph_kind(graph), target_assortativity=target_assortativity, name=name,
+                      sample_size=sample_size, timed=timed, time_limit=time_limit, method=method,
+                      return_type=return_type, audit_every=audit_every, tolerance=tolerance,
+                      batch_size=batch_size, accept=accept, retune_every=retune_every, tune_seconds=tune_seconds,
+                      temperature=temperature, cooling=cooling, cooling_every=cooling_every, validate=validate)
+        checkpoint = Checkpointer(checkpoint_path, checkpoint_every, checkpoint_seconds, params, before)
+
+    profiler.lap('setup')
+    yield stamped(first_row)
+    profiler.lap('yield')
+    try:
+        if method == 'anneal':
+            yield from stream(iter_anneal_rewire(G, target_assortativity, name, results, sample_size, timed, time_limit, tracker=tracker, audit_every=audit_every, rng=rng, checkpoint=checkpoint,
+                              tolerance=tolerance, temperature=temperature, cooling=cooling, cooling_every=cooling_every, profiler=profiler))
+
+        elif tracker.r < target_assortativity:
+          if method == 'new':
+            G = extreme_phase(G, 'max', results, name, sample_size, return_type, tracker, rng, cache, validate)
+            profiler.lap('extreme')
+            yield stamped(results.last_row)
+            profiler.lap('yield')
+            sample_size = tuned_sample_size(sample_size, tune, G, 'negative', tune_seconds, rng, results, checkpoint, profiler)
+            yield from stream(iter_negatively_rewire(G, target_assortativity, name, results, sample_size, timed, time_limit, tracker=tracker, audit_every=audit_every, rng=rng, checkpoint=checkpoint, tolerance=tolerance, batch_size=batch_size, accept=accept,
+                                  retune_every=retune_every, tune_seconds=tune_seconds, profiler=profiler))
+          if method == 'original':
+            sample_size = tuned_sample_size(sample_size, tune, G, 'positive', tune_seconds, rng, results, checkpoint, profiler)
+            yield from stream(iter_positively_rewire(G, target_assortativity, name, results, sample_size, timed, time_limit, tracker=tracker, audit_every=audit_every, rng=rng, checkpoint=checkpoint, tolerance=tolerance, batch_size=batch_size, accept=accept,
+                                  retune_every=retune_every, tune_seconds=tune_seconds, profiler=profiler))
+          if method == 'max':
+            G = extreme_phase(G, 'max', results, name, sample_size, return_type, tracker, rng, cache, validate)
+            profiler.lap('extreme')
+            yield stamped(results.last_row)
+            profiler.lap('yield')
+          if method == 'greedy':
+            yield from stream(iter_greedy_rewire(G, target_assortativity, name, results, sample_size, timed, time_limit, tracker=tracker, audit_every=audit_every, rng=rng, checkpoint=checkpoint, tolerance=tolerance, profiler=profiler))
+
+        else:
+          if method == 'new':
+            G = extreme_phase(G, 'min', results, name, sample_size, return_type, tracker, rng, cache, validate)
+            profiler.lap('extreme')
+            yield stamped(results.last_row)
+            profiler.lap('yield')
+            sample_size = tuned_sample_size(sample_size, tune, G, 'positive', tune_seconds, rng, results, checkpoint, profiler)
+            yield from stream(iter_positively_rewire(G, target_assortativity, name, results, sample_size, timed, time_limit, tracker=tracker, audit_every=audit_every, rng=rng, checkpoint=checkpoint, tolerance=tolerance, batch_size=batch_size, accept=accept,
+                                  retune_every=retune_every, tune_seconds=tune_seconds, profiler=profiler))
+          if method == 'original':
+            sample_size = tuned_sample_size(sample_size, tune, G, 'negative', tune_seconds, rng, results, checkpoint, profiler)
+            yield from stream(iter_negatively_rewire(G, target_assortativity, name, results, sample_size, timed, time_limit, tracker=tracker, audit_every=audit_every, rng=rng, checkpoint=checkpoint, tolerance=tolerance, batch_size=batch_size, accept=accept,
+                                  retune_every=retune_every, tune_seconds=tune_seconds, profiler=profiler))
+          if method == 'max':
+            G = extreme_phase(G, 'min', results, name, sample_size, return_type, tracker, rng, cache, validate)
+            profiler.lap('extreme')
+            yield stamped(results.last_row)
+            profiler.lap('yield')
+          if method == 'greedy':
+            yield from stream(iter_greedy_rewire(G, target_assortativity, name, results, sample_size, timed, time_limit, tracker=tracker, audit_every=audit_every, rng=rng, checkpoint=checkpoint, tolerance=tolerance, profiler=profiler))
+    except GeneratorExit:
+        #closed early: leave a networkx graph as it was rewired so far
+        if isinstance(graph, nx.Graph):
+            G.to_graph(graph)
+        profiler.stop()
+        raise
+
+    out = finish_rewire(G, graph, results, tracker, before, target_assortativity, sample_size, method, return_type, validate)
+    profiler.lap('finish')
+    profiler.stop()
+    if not profiler.enabled:
+        return out
+    return (out if isinstance(out, tuple) else (out,)) + (profiler.report(),)
+
+
+
+def tuned_sample_size(sample_size, tune, G, direction, tune_seconds, rng, results, checkpoint=None, profiler=NULL_PROFILER):
+    """
+    The sample size of the fine tuning phase. If tune is True it is chosen
+    with tune_sample_size, and the rows already recorded and the checkpoint
+    parameters are given the chosen size
+    """
+    if not tune:
+        return sample_size
+    sample_size = tune_sample_size(G, direction, tune_seconds, rng=rng)
+    results.column('sample_size')[:] = sample_size
+    if checkpoint is not None:
+        checkpoint.params['sample_size'] = sample_size
+    profiler.lap('tune')
+    return sample_size
+
+
+
+def degrees_preserved(G, before, validate='off', final=False):
+    """
+    Whether G still has the degrees it started with
+
+    Parameters
+    ----------
+    G : CompactGraph
+        graph being rewired, on which track_degrees has been called unless
+        validate is 'full'. The check is O(1) while G is tracking and one
+        vectorised comparison of the degree array otherwise
+
+    before : np.ndarray
+        sorted degree sequence before rewiring. Only used by 'full'
+
+    validate : str
+        'off', 'sampled' or 'full', see rewire. 'sampled' counts the checks
+        made on G and recounts every degree from the edges on every
+        VALIDATE_EVERY-th of them. A recount is O(E), and counting the
+        degrees of only some nodes would be too, as the edges are not
+        grouped by node
+
+    final : bool
+        whether this is the check of the summary row, on which 'sampled'
+        always recounts
+
+    Returns
+    -------
+    bool
+    """
+    if validate == 'full':
+        return list(before) == list(degree_list(G))
+    preserved = G.degrees_match()
+    if validate == 'sampled':
+        G.degree_checks += 1
+        if preserved and (final or G.degree_checks % VALIDATE_EVERY == 0):
+            preserved = G.verify_degrees()
+    return preserved
+
+
+
+def finish_rewire(G, graph, results, tracker, before, target_assortativity, sample_size, method, return_type, validate='full'):
+    """
+    Adds the summary row to the results and converts the rewired graph back
+    to the kind of object rewire was given
+
+    Parameters
+    ----------
+    G : CompactGraph
+        rewired graph
+
+    graph : networkx.Graph, numpy.ndarray or scipy.sparse matrix
+        the object passed to rewire
+
+    results : ResultsRecorder
+        results of every phase
+
+    tracker : AssortativityTracker
+        tracker holding the final assortativity of G
+
+    before : np.ndarray
+        sorted degree sequence before rewiring if validate is 'full'
+
+    validate : str
+        how 'preserved' is checked, see degrees_preserved
+
+    Returns
+    -------
+    as for rewire
+
+    """
     #we now have a dataframe of all of our relevant results
-    summary_row = {'name': results.loc[results.index[-1], 'name'],
-                   'iteration': results.loc[results.index[-1], 'iteration'], 
-                   'time': results['time'].sum(), 
-                   'r': nx.degree_assortativity_coefficient(G),
+    summary_row = {'name': results.last('name'),
+                   'iteration': results.last('iteration'), 
+                   'time': results.total('time'), 
+                   'r': tracker.r,
                    'target_r': target_assortativity, 
                    'sample_size': sample_size, 
-                   'edges_rewired': results['edges_rewired'].sum(),
-                   'duplicate_edges': results['duplicate_edges'].sum(), 
-                   'self_edges': results['self_edges'].sum(),
-                   'existing_edges': results['existing_edges'].sum(), 
-                   'preserved': list(before) == list(after),
+                   'edges_rewired': results.total('edges_rewired'),
+                   'duplicate_edges': results.total('duplicate_edges'), 
+                   'self_edges': results.total('self_edges'),
+                   'existing_edges': results.total('existing_edges'), 
+                   'partial_swaps': results.total('partial_swaps'),
+                   'preserved': degrees_preserved(G, before, validate, final=True),
                    'method': 0,
                    'summary': 1}
 
@@ -127,8 +542,14 @@ def rewire(G, target_assortativity, name, sample_size = 2, timed = False, time_l
         summary_row['method'] = 2
     if method == 'max':
         summary_row['method'] = 2
+    if method == 'greedy':
+        summary_row['method'] = 3
+    if method == 'anneal':
+        summary_row['method'] = 4
 
-    results.loc[len(results)] = summary_row
+    results.append(summary_row)
+    results = results.to_frame()
+    G = G.to_graph(graph)
 
     if return_type == 'summary':
         summarised_results = results.loc[(results['summary']==1)]
@@ -137,12 +558,76 @@ def rewire(G, target_assortativity, name, sample_size = 2, timed = False, time_l
     else:
         return G, results
     
+def resume_rewire(checkpoint_path, checkpoint_every = None, checkpoint_seconds = None):
+    """
+    Carries on a rewiring from the last checkpoint written by rewire
+
+    Parameters
+    ----------
+    checkpoint_path : str
+        checkpoint file passed to rewire as checkpoint_path. It keeps being
+        checkpointed to
+
+    checkpoint_every : int
+        iterations between further checkpoints
+
+    checkpoint_seconds : float
+        seconds between further checkpoints
+
+    Returns
+    -------
+    as for rewire. A networkx.Graph is returned as a new graph with the
+    original node labels, as the one passed to rewire is gone with the
+    process that was rewiring it
+
+    """
+    meta, G, rng_state, results, before = load_checkpoint(checkpoint_path)
+    rng = random.Random()
+    rng.setstate(rng_state)
+    tracker = AssortativityTracker(G)
+    validate = meta.get('validate', 'full')
+    if validate != 'full':
+        G.track_degrees(before, tracking=False)
+    checkpoint = Checkpointer(checkpoint_path, checkpoint_every, checkpoint_seconds,
+                              {key: meta[key] for key in meta if key in CHECKPOINT_PARAMS}, before)
+    checkpoint.last_iteration = meta['iteration']
+    checkpoint.rows_written = meta['rows']
+
+    kwargs = {'tolerance': meta.get('tolerance')}
+    if meta['phase'] == 'positive':
+        fine_tune = positively_rewire
+        kwargs['batch_size'] = meta.get('batch_size')
+        kwargs['accept'] = meta.get('accept', 'all')
+        kwargs['retune_every'] = meta.get('retune_every', 0)
+        kwargs['tune_seconds'] = meta.get('tune_seconds', 1.0)
+    elif meta['phase'] == 'greedy':
+        fine_tune = greedy_rewire
+    elif meta['phase'] == 'anneal':
+        fine_tune = anneal_rewire
+        kwargs['temperature'] = meta['temperature']
+        kwargs['cooling'] = meta['cooling']
+        kwargs['cooling_every'] = meta['cooling_every']
+    else:
+        fine_tune = negatively_rewire
+        kwargs['batch_size'] = meta.get('batch_size')
+        kwargs['accept'] = meta.get('accept', 'all')
+        kwargs['retune_every'] = meta.get('retune_every', 0)
+        kwargs['tune_seconds'] = meta.get('tune_seconds', 1.0)
+    G = fine_tune(G, meta['target_assortativity'], meta['name'], results, meta['sample_size'], meta['timed'],
+                  meta['time_limit'], tracker=tracker, audit_every=meta['audit_every'], rng=rng,
+                  checkpoint=checkpoint, start_iteration=meta['iteration'], elapsed=meta['elapsed'], **kwargs)
+
+    return finish_rewire(G, empty_graph(meta, G), results, tracker, before, meta['target_assortativity'],
+                         meta['sample_size'], meta['method'], meta['return_type'], validate)
+
+
+
 def degree_list(G):
     """
     Parameters
     ----------
 
-    G : networkx.Graph OR list
+    G : networkx.Graph, CompactGraph OR list
 
 
     Returns
@@ -154,6 +639,8 @@ def degree_list(G):
     if type(G) == nx.classes.graph.Graph:
         degree_dict = dict(G.degree())
         degree_list = list(degree_dict.values())
+    elif isinstance(G, CompactGraph):
+        degree_list = G.degree.tolist()
     else:
         degree_list = G
     degree_list.sort()
@@ -162,20 +649,27 @@ def degree_list(G):
 
 
 
-def check_new_edges(potential_edges, G, row):
+def check_new_edges(potential_edges, G, row, return_index=False):
     """
     Takes the edges that will be potentially added to the Graph and checks
-    for any issues
+    for any issues. Edges are reduced to canonical (min, max) integer keys so
+    that duplicates, in either orientation, are found with one hashed count
+    and existing edges with one bulk lookup, in time linear in the number of
+    potential edges.
     Parameters
     ---------
     potential_edges : list of lists
         the edges to be checked
     
-    G : networkx.Graph
-        graph needed to check if any potential edges exist already
+    G : CompactGraph or networkx.Graph
+        edges needed to check if any potential edges exist already. A
+        CompactGraph is checked against its hashed edge index
 
     row : the row to be added to the results DataFrame is edited here
 
+    return_index : bool
+        also return the positions in potential_edges of the checked edges
+
     Returns
     -------
     edges_to_add : list of lists
@@ -184,66 +678,761 @@ def check_new_edges(potential_edges, G, row):
     row : dict
         the information to go into the results DataFrame
 
+    kept : list of ints
+        positions of the checked edges in potential_edges. Only returned if
+        return_index is True
+
     """
-    edges_to_add = []
-    for edge in potential_edges:
-        if G.has_edge(edge[0], edge[1]) == False:
-            if edge[0] != edge[1]:
-                if [edge[1], edge[0]] not in potential_edges:
-                    if potential_edges.count(edge) == 1:
-                        edges_to_add.append(edge)
-                    else:
-                        row['duplicate_edges'] += 0.5
-                else:
-                    row['duplicate_edges'] += 0.5
-            else:
+    if isinstance(G, CompactGraph):
+        n = G.n_nodes
+        pairs = potential_edges
+        keys = [u*n + v if u < v else v*n + u for u, v in pairs]
+        exists = [G.has_edge(u, v) for u, v in pairs]
+    else:
+        index = {}
+        for edge in potential_edges:
+            for node in edge:
+                if node not in index:
+                    index[node] = len(index)
+        n = len(index)
+        pairs = [(index[edge[0]], index[edge[1]]) for edge in potential_edges]
+        keys = [u*n + v if u < v else v*n + u for u, v in pairs]
+        exists = [G.has_edge(edge[0], edge[1]) for edge in potential_edges]
+
+    if len(keys) < VECTORISE_FROM:
+        counts = Counter(keys)
+        edges_to_add = []
+        kept = []
+        for i, (edge, (u, v), key, edge_exists) in enumerate(zip(potential_edges, pairs, keys, exists)):
+            if edge_exists:
+                row['existing_edges'] += 1
+            elif u == v:
                 row['self_edges'] += 1
+            elif counts[key] > 1:
+                row['duplicate_edges'] += 0.5
+            else:
+                edges_to_add.append(edge)
+                kept.append(i)
+        if return_index:
+            return edges_to_add, row, kept
+        return edges_to_add, row
+
+    pairs = np.array(pairs)
+    exists = np.array(exists, dtype=bool)
+    self_edges = (pairs[:, 0] == pairs[:, 1]) & ~exists
+    _, inverse, counts = np.unique(np.array(keys), return_inverse=True, return_counts=True)
+    duplicates = (counts[inverse] > 1) & ~exists & ~self_edges
+    row['existing_edges'] += int(exists.sum())
+    row['self_edges'] += int(self_edges.sum())
+    row['duplicate_edges'] += 0.5*int(duplicates.sum())
+    keep = np.flatnonzero(~(exists | self_edges | duplicates))
+    edges_to_add = [potential_edges[i] for i in keep]
+
+    if return_index:
+        return edges_to_add, row, keep.tolist()
+    return edges_to_add, row 
+
+
+
+def overshoots(tracker, edges_to_remove, edges_to_add, target_assortativity, tolerance):
+    """
+    Whether swapping edges_to_remove for edges_to_add would take r past the
+    band of width tolerance around the target, to the other side of it
+
+    Parameters
+    ----------
+    tracker : AssortativityTracker
+        tracker holding the current assortativity
+
+    edges_to_remove, edges_to_add : lists of edges
+        the proposed swap
+
+    target_assortativity : double
+        desired assortativity value
+
+    tolerance : double
+        half width of the band of acceptable values around the target
+
+    Returns
+    -------
+    bool
+
+    """
+    return overshoots_band(tracker.r, tracker.r_after(edges_to_remove, edges_to_add), target_assortativity, tolerance)
+
+
+
+def overshoots_band(r, r_new, target_assortativity, tolerance):
+    """
+    Whether moving from r to r_new passes the band of width tolerance
+    around the target, ending outside it on the other side of the target
+    """
+    if abs(r_new - target_assortativity) <= tolerance:
+        return False
+    return (r_new - target_assortativity)*(r - target_assortativity) < 0
+
+
+
+def tuning_done(r, target_assortativity, tolerance, direction):
+    """
+    Whether the fine tuning phase moving r in the given direction, 1 up or
+    -1 down, is over: r is within tolerance of the target, or is at or past
+    the target in that direction, where the phase cannot bring it any
+    closer. Swaps taking r past the band are rejected, so with a tolerance
+    the second only happens when the phase starts there, as it does after
+    the extreme phase when the target is out of reach. r is NaN when every
+    edge end has the same degree, as on a regular graph, and no swap can
+    change it, so the phase is over at once
+    """
+    if math.isnan(r):
+        return True
+    if tolerance is not None and abs(r - target_assortativity) <= tolerance:
+        return True
+    return direction*(r - target_assortativity) >= 0
+
+
+
+def batch_step(G, tracker, row, batch_size, assortative, rng, target_assortativity, stop, tolerance, profiler=NULL_PROFILER):
+    """
+    One iteration of the fine tuning phase made of batch_size independent
+    double edge swaps. The swaps that can be made are committed in the
+    order they were drawn until r reaches stop. With a tolerance, the swap
+    reaching stop is left out if it overshoots the band around the target.
+
+    Parameters
+    ----------
+    G : CompactGraph
+        graph being rewired
+
+    tracker : AssortativityTracker
+        tracker holding the current assortativity of G
+
+    row : dict
+        row of the results for this iteration, updated here
+
+    batch_size : int
+        number of swaps to propose
+
+    assortative : bool
+        whether the swaps should increase r
+
+    rng : random.Random
+        source of randomness, which seeds the NumPy generator of the batch
+
+    target_assortativity, stop : double
+        the target and the value of r at which the phase stops
+
+    tolerance : double or None
+        half width of the band around the target
+
+    profiler : Profiler
+        charged with the time of proposing, committing and tracking
+
+    Returns
+    -------
+    bool
+        whether a swap was left out for overshooting, in which case the
+        batch size should shrink
+    """
+    draws = np.random.default_rng(rng.getrandbits(64))
+    slots, new_edges, delta_jk, counts = propose_swaps(G, batch_size, assortative, draws)
+    for col in counts:
+        row[col] += counts[col]
+    profiler.lap('propose')
+    direction = 1 if assortative else -1
+    total = np.cumsum(delta_jk)
+    reached = np.flatnonzero(direction*total >= direction*(tracker.sum_jk_at(stop) - tracker.sum_jk))
+    n_take = len(delta_jk) if len(reached) == 0 else int(reached[0]) + 1
+    overshot = False
+    if tolerance is not None and len(reached) > 0:
+        r = tracker.r
+        tracker.shift_jk(total[n_take - 1])
+        r_new = tracker.r
+        tracker.shift_jk(-total[n_take - 1])
+        if n_take > 1:
+            tracker.shift_jk(total[n_take - 2])
+            r = tracker.r
+            tracker.shift_jk(-total[n_take - 2])
+        if overshoots_band(r, r_new, target_assortativity, tolerance):
+            n_take -= 1
+            overshot = True
+    commit_swaps(G, slots[:n_take], new_edges[:n_take])
+    profiler.lap('mutate')
+    if n_take:
+        tracker.shift_jk(total[n_take - 1])
+    profiler.lap('assortativity')
+    row['edges_rewired'] += 2*n_take
+    return overshot
+
+
+
+def partial_accept(G, tracker, row, edges_to_remove, potential_edges, kept, assortative, target_assortativity, tolerance=None):
+    """
+    Commits the parts of a sample of edges that can be rewired on their own
+    when some of its potential edges are invalid.
+
+    Every removed edge gives two stubs, and every potential edge joins two
+    of them. Linking the removed edges that give the stubs of each potential
+    edge splits the sample into components whose removed and potential
+    edges have the same nodes, so rewiring any union of components keeps
+    the degrees. A component is committed if all of its potential edges are
+    valid, none of them is an edge of a component being put back and they
+    are not just its removed edges paired again.
+
+    Parameters
+    ----------
+    G : CompactGraph
+        graph with edges_to_remove already removed
+
+    tracker : AssortativityTracker
+        tracker holding the assortativity of G before the removal
+
+    row : dict
+        row of the results for this iteration, updated here
+
+    edges_to_remove : list of edges
+        the sampled edges
+
+    potential_edges : list of edges
+        the edges made from their nodes, sorted by degree
+
+    kept : list of ints
+        positions of the valid potential edges, as returned by
+        check_new_edges
+
+    assortative : bool
+        whether the nodes were paired as in positively_rewire, rather than
+        as in negatively_rewire
+
+    target_assortativity : double
+        desired assortativity value
+
+    tolerance : double
+        half width of the band around the target. If the components would
+        overshoot it, nothing is committed
+
+    Returns
+    -------
+    bool
+        whether the components were rolled back for overshooting, in which
+        case the sample size should shrink
+
+    """
+    #the degrees before the sample was removed, which the pairing was sorted by
+    degree = tracker.degree
+    stubs = [node for edge in edges_to_remove for node in edge]
+    order = sorted(range(len(stubs)), key=lambda s: degree[stubs[s]])
+    if assortative:
+        stub_pairs = [(order[i], order[i+1]) for i in range(0, len(order), 2)]
+    else:
+        stub_pairs = [(order[i], order[len(order) - 1 - i]) for i in range(len(order)//2)]
+
+    parent = list(range(len(edges_to_remove)))
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+    for s, t in stub_pairs:
+        parent[find(s//2)] = find(t//2)
+
+    valid = set(kept)
+    ok = {find(i): True for i in range(len(edges_to_remove))}
+    component = [find(s//2) for s, t in stub_pairs]
+    for j, c in enumerate(component):
+        if j not in valid:
+            ok[c] = False
+    #components that pair their stubs back into the edges they removed change nothing
+    removed_keys = {c: set() for c in ok}
+    added_keys = {c: set() for c in ok}
+    for i, edge in enumerate(edges_to_remove):
+        removed_keys[find(i)].add(G.key(*edge))
+    for j, c in enumerate(component):
+        added_keys[c].add(G.key(*potential_edges[j]))
+    for c in ok:
+        if removed_keys[c] == added_keys[c]:
+            ok[c] = False
+    #a potential edge may be one of the removed edges of a component that is put back
+    changed = True
+    while changed:
+        changed = False
+        restored = {G.key(*edge) for i, edge in enumerate(edges_to_remove) if not ok[find(i)]}
+        for j, c in enumerate(component):
+            if ok[c] and G.key(*potential_edges[j]) in restored:
+                ok[c] = False
+                changed = True
+
+    removed = [edge for i, edge in enumerate(edges_to_remove) if ok[find(i)]]
+    added = [potential_edges[j] for j, c in enumerate(component) if ok[c]]
+    if not added:
+        G.add_edges(edges_to_remove)
+        return False
+    if tolerance is not None and overshoots(tracker, removed, added, target_assortativity, tolerance):
+        G.add_edges(edges_to_remove)
+        return True
+    G.add_edges([edge for i, edge in enumerate(edges_to_remove) if not ok[find(i)]])
+    G.add_edges(added)
+    tracker.remove_edges(removed)
+    tracker.add_edges(added)
+    #edges re-paired into themselves within a changed component are not counted
+    row['edges_rewired'] += sum(len(removed_keys[c] - added_keys[c]) for c in ok if ok[c])
+    row['partial_swaps'] += sum(ok.values())
+    return False
+
+
+
+def positively_rewire(G: CompactGraph, target_assortativity, name, results, sample_size = 2, timed = True, time_limit=600, tracker=None, audit_every=0, rng=random, checkpoint=None, start_iteration=None, elapsed=0, tolerance=None, batch_size=None, accept='all', retune_every=0, tune_seconds=1.0, profiler=NULL_PROFILER):
+    """
+    Function for fine tuning the assortativity value of a graph.
+    
+    Parameters
+    ----------
+    G: CompactGraph
+      Graph to be rewired
+
+    target_assortativity: double
+      desired assortativity value
+
+    results: ResultsRecorder
+      recorder to be added to. One row per iteration
+
+    sample_size: int
+      number of edges to be rewired per iteration. The default is 2
+
+    timed: bool
+      whether or not to stop the algorithm after a certain amount of time. The default is True
+
+    time_limit: double
+      time after which to stop iterating. The default is 600 seconds.
+
+    tracker: AssortativityTracker
+      tracker holding the current assortativity of G. Created from G if not given
+
+    audit_every: int
+      compare the tracked assortativity with networkx every audit_every
+      iterations. The default of 0 never checks
+
+    rng: random.Random
+      source of randomness. The default is the random module
+
+    checkpoint: Checkpointer
+      writes a checkpoint whenever one is due. The default of None never does
+
+    start_iteration: int
+      iteration to carry on from when resuming from a checkpoint
+
+    elapsed: double
+      seconds already spent in this phase when resuming from a checkpoint
+
+    tolerance: double
+      run until r is within tolerance of the target, rejecting batches that
+      would take r past the band and halving the number of edges sampled
+      when they do, down to the 2 edges of a single swap. The default of
+      None runs until r crosses the target
+
+    batch_size: int
+      if given, each iteration instead proposes batch_size independent
+      double edge swaps with propose_swaps and commits every one that can
+      be made, up to the one that reaches the target. sample_size is then
+      unused and the sample_size column holds the batch size
+
+    accept: str
+      'all' rolls back the whole sample whenever one of its new edges is
+      invalid. 'partial' commits every part of the sample that preserves the
+      degrees on its own and only rolls back the rest, see partial_accept
+
+    retune_every: int
+      choose the sample size again with tune_sample_size every retune_every
+      iterations. The default of 0 never does
+
+    tune_seconds: double
+      time given to each run of tune_sample_size
+
+    profiler: Profiler
+      charged with the time of each step of the loop. The default records
+      nothing
+
+    Returns
+    -------
+    G: CompactGraph
+      rewired graph
+
+    results: ResultsRecorder
+      recorder of results, one line per iteration
+    """
+    for _ in iter_positively_rewire(G, target_assortativity, name, results, sample_size=sample_size, timed=timed, time_limit=time_limit, tracker=tracker, audit_every=audit_every, rng=rng, checkpoint=checkpoint, start_iteration=start_iteration, elapsed=elapsed, tolerance=tolerance, batch_size=batch_size, accept=accept, retune_every=retune_every, tune_seconds=tune_seconds, profiler=profiler):
+        pass
+    return G
+
+
+
+def iter_positively_rewire(G: CompactGraph, target_assortativity, name, results, sample_size = 2, timed = True, time_limit=600, tracker=None, audit_every=0, rng=random, checkpoint=None, start_iteration=None, elapsed=0, tolerance=None, batch_size=None, accept='all', retune_every=0, tune_seconds=1.0, profiler=NULL_PROFILER):
+    """
+    Generator version of positively_rewire, yielding the row of each iteration once
+    it is recorded. G is consistent at every yield, and closing the
+    generator stops the rewiring there
+    """
+
+    alg_start = time.time() - elapsed
+    itr = 1 if start_iteration is None else start_iteration
+    if tracker is None:
+        tracker = AssortativityTracker(G)
+    stop = target_assortativity if tolerance is None else target_assortativity - tolerance
+    active_size = batch_size if batch_size else sample_size
+    while not tuning_done(tracker.r, target_assortativity, tolerance, 1):
+        loop_start = time.time()
+        itr += 1
+        if retune_every and not batch_size and itr % retune_every == 0:
+            active_size = tune_sample_size(G, 'positive', tune_seconds, rng=rng)
+            profiler.lap('tune')
+        #define dictionary to track relevant info for each loop
+        row = {'name': name,
+               'iteration' : itr, 
+               'time' : 0, 
+               'r' : 0,
+               'target_r': target_assortativity,
+               'sample_size': active_size, 
+               'edges_rewired': 0,
+               'duplicate_edges': 0, 
+               'self_edges': 0,
+               'existing_edges': 0, 
+               'partial_swaps': 0,
+               'preserved': True,
+               'method': 2,
+               'summary': 0}
+
+        if batch_size:
+            if batch_step(G, tracker, row, active_size, True, rng, target_assortativity, stop, tolerance, profiler):
+                active_size = max(1, active_size//2)
         else:
-            row['existing_edges'] += 1
+            edges_to_remove = G.sample_edges(active_size, rng)
+            deg_dict = {}
+            nodes = []
+            for edge in edges_to_remove:
+                for node in edge:
+                    nodes.append(node)
+                    deg_dict[node] = G.degree[node]
+    
+            nodes_sorted = sorted(nodes, key=deg_dict.get)
+            potential_edges = [[nodes_sorted[i], nodes_sorted[i+1]] for i in range(0,len(nodes_sorted),2)]
+            profiler.lap('sample')
+            G.remove_edges(edges_to_remove)
+            edges_to_add, row, kept = check_new_edges(potential_edges, G, row, return_index=True)
+            profiler.lap('check')
+                
+            if len(edges_to_add) == active_size and tolerance is not None and overshoots(tracker, edges_to_remove, edges_to_add, target_assortativity, tolerance):
+                G.add_edges(edges_to_remove)
+                #2 edges are a single swap
+                active_size = max(2, active_size//2)
+            elif len(edges_to_add) == active_size:
+                G.add_edges(edges_to_add)
+                profiler.lap('mutate')
+                tracker.remove_edges(edges_to_remove)
+                tracker.add_edges(edges_to_add)
+                profiler.lap('assortativity')
+                row['edges_rewired'] += active_size
+            elif accept == 'partial':
+                if partial_accept(G, tracker, row, edges_to_remove, potential_edges, kept, True, target_assortativity, tolerance):
+                    active_size = max(2, active_size//2)
+            else:
+                G.add_edges(edges_to_remove)
+            profiler.lap('mutate')
+
+        row['r'] = tracker.r
+        row['time'] += time.time() - loop_start
+        if audit_every and itr % audit_every == 0:
+            tracker.audit(G)
+            profiler.lap('audit')
+        results.append(row)
+        profiler.lap('log')
+        if checkpoint is not None and checkpoint.due(itr):
+            checkpoint.save(G, rng, itr, results, time.time() - alg_start, 'positive')
+            profiler.lap('checkpoint')
+        yield row
+        profiler.lap('yield')
+
+        time_elapsed = time.time() - alg_start
+    
+        
+        if timed == True:
+            if time_elapsed > time_limit:
+                return G
+
+    return G
+
+
+
+def negatively_rewire(G: CompactGraph, target_assortativity, name, results, sample_size = 2, timed = False, time_limit=600, tracker=None, audit_every=0, rng=random, checkpoint=None, start_iteration=None, elapsed=0, tolerance=None, batch_size=None, accept='all', retune_every=0, tune_seconds=1.0, profiler=NULL_PROFILER):
+    
+    """
+    Function for fine tuning the assortativity value of a graph.
+    
+    Parameters
+    ----------
+    G: CompactGraph
+      Graph to be rewired
+
+    target_assortativity: double
+      desired assortativity value
+
+    results: ResultsRecorder
+      recorder to be added to. One row per iteration
+
+    sample_size: int
+      number of edges to be rewired per iteration. The default is 2
+
+    timed: bool
+      whether or not to stop the algorithm after a certain amount of time. The default is True
+
+    time_limit: double
+      time after which to stop iterating. The default is 600 seconds.
+
+    tracker: AssortativityTracker
+      tracker holding the current assortativity of G. Created from G if not given
+
+    audit_every: int
+      compare the tracked assortativity with networkx every audit_every
+      iterations. The default of 0 never checks
+
+    rng: random.Random
+      source of randomness. The default is the random module
+
+    checkpoint: Checkpointer
+      writes a checkpoint whenever one is due. The default of None never does
+
+    start_iteration: int
+      iteration to carry on from when resuming from a checkpoint
+
+    elapsed: double
+      seconds already spent in this phase when resuming from a checkpoint
+
+    tolerance: double
+      run until r is within tolerance of the target, rejecting batches that
+      would take r past the band and halving the number of edges sampled
+      when they do, down to the 2 edges of a single swap. The default of
+      None runs until r crosses the target
+
+    batch_size: int
+      if given, each iteration instead proposes batch_size independent
+      double edge swaps with propose_swaps and commits every one that can
+      be made, up to the one that reaches the target. sample_size is then
+      unused and the sample_size column holds the batch size
+
+    accept: str
+      'all' rolls back the whole sample whenever one of its new edges is
+      invalid. 'partial' commits every part of the sample that preserves the
+      degrees on its own and only rolls back the rest, see partial_accept
+
+    retune_every: int
+      choose the sample size again with tune_sample_size every retune_every
+      iterations. The default of 0 never does
+
+    tune_seconds: double
+      time given to each run of tune_sample_size
+
+    profiler: Profiler
+      charged with the time of each step of the loop. The default records
+      nothing
+
+    Returns
+    -------
+    G: CompactGraph
+      rewired graph
+
+    results: ResultsRecorder
+      recorder of results, one line per iteration
+    """
+    for _ in iter_negatively_rewire(G, target_assortativity, name, results, sample_size=sample_size, timed=timed, time_limit=time_limit, tracker=tracker, audit_every=audit_every, rng=rng, checkpoint=checkpoint, start_iteration=start_iteration, elapsed=elapsed, tolerance=tolerance, batch_size=batch_size, accept=accept, retune_every=retune_every, tune_seconds=tune_seconds, profiler=profiler):
+        pass
+    return G
+
+
+
+def iter_negatively_rewire(G: CompactGraph, target_assortativity, name, results, sample_size = 2, timed = False, time_limit=600, tracker=None, audit_every=0, rng=random, checkpoint=None, start_iteration=None, elapsed=0, tolerance=None, batch_size=None, accept='all', retune_every=0, tune_seconds=1.0, profiler=NULL_PROFILER):
+    """
+    Generator version of negatively_rewire, yielding the row of each iteration once
+    it is recorded. G is consistent at every yield, and closing the
+    generator stops the rewiring there
+    """
+    
+    alg_start = time.time() - elapsed
+    itr = 0 if start_iteration is None else start_iteration
+    if tracker is None:
+        tracker = AssortativityTracker(G)
+    stop = target_assortativity if tolerance is None else target_assortativity + tolerance
+    active_size = batch_size if batch_size else sample_size
+    while not tuning_done(tracker.r, target_assortativity, tolerance, -1):
+        loop_start = time.time()
+        itr += 1
+        if retune_every and not batch_size and itr % retune_every == 0:
+            active_size = tune_sample_size(G, 'negative', tune_seconds, rng=rng)
+            profiler.lap('tune')
+        #define dictionary to track relevant info for each loop
+        row = {'name' : name,
+               'iteration' : itr, 
+               'time' : 0, 
+               'r' : 0,
+               'target_r': target_assortativity,
+               'sample_size': active_size, 
+               'edges_rewired': 0,
+               'duplicate_edges': 0, 
+               'self_edges': 0,
+               'existing_edges': 0, 
+               'partial_swaps': 0,
+               'preserved': True,
+               'method': 2,
+               'summary': 0}
+
+        if batch_size:
+            if batch_step(G, tracker, row, active_size, False, rng, target_assortativity, stop, tolerance, profiler):
+                active_size = max(1, active_size//2)
+        else:
+            edges_to_remove = G.sample_edges(active_size, rng)
+            deg_dict = {}
+            nodes = []
+            for edge in edges_to_remove:
+                for node in edge:
+                    nodes.append(node)
+                    deg_dict[node] = G.degree[node]
+    
+            nodes_sorted = sorted(nodes, key = deg_dict.get)
+            n_nodes = int(len(nodes_sorted)/2)
+        
+            potential_edges = [(nodes_sorted[i], nodes_sorted[len(nodes) - 1 - i]) for i in range(n_nodes)]
+            profiler.lap('sample')
+            G.remove_edges(edges_to_remove)
+            edges_to_add, row, kept = check_new_edges(potential_edges, G, row, return_index=True)
+            profiler.lap('check')
+        
+            if len(edges_to_add) == len(potential_edges) and tolerance is not None and overshoots(tracker, edges_to_remove, edges_to_add, target_assortativity, tolerance):
+                G.add_edges(edges_to_remove)
+                #2 edges are a single swap
+                active_size = max(2, active_size//2)
+            elif len(edges_to_add) == len(potential_edges):
+                G.add_edges(edges_to_add)
+                profiler.lap('mutate')
+                tracker.remove_edges(edges_to_remove)
+                tracker.add_edges(edges_to_add)
+                profiler.lap('assortativity')
+                row['edges_rewired'] += active_size
+            elif accept == 'partial':
+                if partial_accept(G, tracker, row, edges_to_remove, potential_edges, kept, False, target_assortativity, tolerance):
+                    active_size = max(2, active_size//2)
+            else:
+                G.add_edges(edges_to_remove)
+            profiler.lap('mutate')
+
+        row['r'] = tracker.r
+        row['time'] += time.time() - loop_start
+        if audit_every and itr % audit_every == 0:
+            tracker.audit(G)
+            profiler.lap('audit')
+        results.append(row)
+        profiler.lap('log')
+        if checkpoint is not None and checkpoint.due(itr):
+            checkpoint.save(G, rng, itr, results, time.time() - alg_start, 'negative')
+            profiler.lap('checkpoint')
+        yield row
+        profiler.lap('yield')
+        time_elapsed = time.time() - alg_start
+        
+        if timed == True:
+            if time_elapsed > time_limit:
+                return G
 
-    return edges_to_add, row 
+    return G
 
 
 
-def positively_rewire(G: nx.Graph, target_assortativity, name, results, sample_size = 2, timed = True, time_limit=600):
+def greedy_rewire(G: CompactGraph, target_assortativity, name, results, sample_size = 2, timed = False, time_limit=600, tracker=None, audit_every=0, rng=random, checkpoint=None, start_iteration=None, elapsed=0, tolerance=None, profiler=NULL_PROFILER):
     """
-    Function for fine tuning the assortativity value of a graph.
-    
+    Fine tunes the assortativity of a graph by drawing sample_size candidate
+    double edge swaps at each iteration and applying the best of them.
+
+    A candidate replaces the edges (a, b) and (c, d) with either (a, c),
+    (b, d) or (a, d), (b, c). As the degrees are fixed, the change in the
+    sum of j*k over the edges, and so in r, is known exactly from the four
+    degrees, so the candidates are drawn and scored in one vectorised pass
+    and the better orientation of each kept. Candidates that move r towards
+    the target are then applied best first, skipping any whose edges were
+    already swapped this iteration or whose new edges are self edges or
+    already exist, until r reaches the target.
+
     Parameters
     ----------
-    G: nx.Graph
+    G: CompactGraph
       Graph to be rewired
 
     target_assortativity: double
       desired assortativity value
 
-    results: pandas.DataFrame
-      DataFrame to be added to. One row per iteration. Must have columns as in rewire function
+    results: ResultsRecorder
+      recorder to be added to. One row per iteration
 
     sample_size: int
-      number of edges to be rewired per iteration. The default is 2
+      number of candidate swaps drawn per iteration. The default is 2
 
     timed: bool
-      whether or not to stop the algorithm after a certain amount of time. The default is True
+      whether or not to stop the algorithm after a certain amount of time. The default is False
 
     time_limit: double
       time after which to stop iterating. The default is 600 seconds.
 
+    tracker: AssortativityTracker
+      tracker holding the current assortativity of G. Created from G if not given
+
+    audit_every: int
+      compare the tracked assortativity with networkx every audit_every
+      iterations. The default of 0 never checks
+
+    rng: random.Random
+      source of randomness. The default is the random module
+
+    checkpoint: Checkpointer
+      writes a checkpoint whenever one is due. The default of None never does
+
+    start_iteration: int
+      iteration to carry on from when resuming from a checkpoint
+
+    elapsed: double
+      seconds already spent in this phase when resuming from a checkpoint
+
+    tolerance: double
+      run until r is within tolerance of the target, skipping swaps that
+      would take r past the band. The default of None runs until r crosses
+      the target
+
+    profiler: Profiler
+      charged with the time of each step of the loop. The default records
+      nothing
+
     Returns
     -------
-    G: nx.Graph
+    G: CompactGraph
       rewired graph
+    """
+    for _ in iter_greedy_rewire(G, target_assortativity, name, results, sample_size=sample_size, timed=timed, time_limit=time_limit, tracker=tracker, audit_every=audit_every, rng=rng, checkpoint=checkpoint, start_iteration=start_iteration, elapsed=elapsed, tolerance=tolerance, profiler=profiler):
+        pass
+    return G
+
+
 
-    results: pandas.DataFrame
-      DataFrame of results, one line per iteration
+def iter_greedy_rewire(G: CompactGraph, target_assortativity, name, results, sample_size = 2, timed = False, time_limit=600, tracker=None, audit_every=0, rng=random, checkpoint=None, start_iteration=None, elapsed=0, tolerance=None, profiler=NULL_PROFILER):
+    """
+    Generator version of greedy_rewire, yielding the row of each iteration once
+    it is recorded. G is consistent at every yield, and closing the
+    generator stops the rewiring there
     """
 
-    alg_start = time.time()
-    itr = 1
-    while nx.degree_assortativity_coefficient(G) < target_assortativity:
+    alg_start = time.time() - elapsed
+    itr = 0 if start_iteration is None else start_iteration
+    if tracker is None:
+        tracker = AssortativityTracker(G)
+    direction = 1 if tracker.r < target_assortativity else -1
+    degree = G.degree
+    while not tuning_done(tracker.r, target_assortativity, tolerance, direction):
         loop_start = time.time()
         itr += 1
-        #define dictionary to track relevant info for each loop
         row = {'name': name,
                'iteration' : itr, 
                'time' : 0, 
@@ -254,37 +1443,67 @@ def positively_rewire(G: nx.Graph, target_assortativity, name, results, sample_s
                'duplicate_edges': 0, 
                'self_edges': 0,
                'existing_edges': 0, 
+               'partial_swaps': 0,
                'preserved': True,
-               'method': 2,
+               'method': 3,
                'summary': 0}
 
-        edges = list(G.edges())                
-        edges_to_remove = random.sample(edges, sample_size)
-        deg_dict = {}
-        nodes = []
-        for edge in edges_to_remove:
-            for node in edge:
-                nodes.append(node)
-                deg_dict[node] = G.degree(node)
-    
-        nodes_sorted = sorted(nodes, key=deg_dict.get)
-        potential_edges = [[nodes_sorted[i], nodes_sorted[i+1]] for i in range(0,len(nodes_sorted),2)]
-        G.remove_edges_from(edges_to_remove)
-        edges_to_add, row = check_new_edges(potential_edges, G, row)
-                
-        if len(edges_to_add) == sample_size:
-            G.add_edges_from(edges_to_add)
-            row['edges_rewired'] += sample_size
-        else:
-            G.add_edges_from(edges_to_remove)
-
+        #the NumPy stream is seeded from rng so that a seed or checkpoint fixes the run
+        draws = np.random.default_rng(rng.getrandbits(64))
+        slots = draws.integers(0, G.size, size=(sample_size, 2))
+        slots = slots[slots[:, 0] != slots[:, 1]]
+        a, b = G.edges[slots[:, 0]].T
+        c, d = G.edges[slots[:, 1]].T
+        ka, kb, kc, kd = degree[a], degree[b], degree[c], degree[d]
+        old_jk = ka*kb + kc*kd
+        cross = direction*(ka*kc + kb*kd - old_jk)
+        twist = direction*(ka*kd + kb*kc - old_jk)
+        use_twist = twist > cross
+        score = np.where(use_twist, twist, cross)
+        new_c = np.where(use_twist, d, c)
+        new_d = np.where(use_twist, c, d)
+        profiler.lap('sample')
+
+        used = set()
+        for i in np.argsort(-score, kind='stable'):
+            if score[i] <= 0 or tuning_done(tracker.r, target_assortativity, tolerance, direction):
+                break
+            p, q = slots[i].tolist()
+            if p in used or q in used:
+                continue
+            u, v, x, y = int(a[i]), int(new_c[i]), int(b[i]), int(new_d[i])
+            if u == v or x == y:
+                row['self_edges'] += 1
+                continue
+            if G.has_edge(u, v) or G.has_edge(x, y):
+                row['existing_edges'] += 1
+                continue
+            edges_to_remove = [(int(a[i]), int(b[i])), (int(c[i]), int(d[i]))]
+            edges_to_add = [(u, v), (x, y)]
+            if tolerance is not None and overshoots(tracker, edges_to_remove, edges_to_add, target_assortativity, tolerance):
+                continue
+            G.replace_edge(p, u, v)
+            G.replace_edge(q, x, y)
+            tracker.remove_edges(edges_to_remove)
+            tracker.add_edges(edges_to_add)
+            used.update((p, q))
+            row['edges_rewired'] += 2
+        profiler.lap('mutate')
+
+        row['r'] = tracker.r
         row['time'] += time.time() - loop_start
-        row['r'] = nx.degree_assortativity_coefficient(G)
-        results.loc[len(results)] = row
-
+        if audit_every and itr % audit_every == 0:
+            tracker.audit(G)
+            profiler.lap('audit')
+        results.append(row)
+        profiler.lap('log')
+        if checkpoint is not None and checkpoint.due(itr):
+            checkpoint.save(G, rng, itr, results, time.time() - alg_start, 'greedy')
+            profiler.lap('checkpoint')
+        yield row
+        profiler.lap('yield')
         time_elapsed = time.time() - alg_start
-    
-        
+
         if timed == True:
             if time_elapsed > time_limit:
                 return G
@@ -293,47 +1512,135 @@ def positively_rewire(G: nx.Graph, target_assortativity, name, results, sample_s
 
 
 
-def negatively_rewire(G: nx.Graph, target_assortativity, name, results, sample_size = 2, timed = False, time_limit=600):
-    
+def anneal_rewire(G: CompactGraph, target_assortativity, name, results, sample_size = 2, timed = False, time_limit=600, tracker=None, audit_every=0, rng=random, checkpoint=None, start_iteration=None, elapsed=0, tolerance=None, temperature=None, cooling=0.95, cooling_every=1000, profiler=NULL_PROFILER):
     """
-    Function for fine tuning the assortativity value of a graph.
-    
+    Rewires a graph towards the target assortativity with a Metropolis
+    search on |r - target|.
+
+    Each proposal takes two random edges, sorts their four nodes by degree
+    and pairs them as positively_rewire does with a sample_size of 2 while
+    r is below the target, and as negatively_rewire does while it is above.
+    Proposals making a self edge or an existing edge are rejected as in the
+    other methods. As the degrees are fixed, the change in r is known
+    exactly from the four degrees. A proposal getting closer to the target
+    is always made, and one moving away by dE, by jumping past the target,
+    is made with probability exp(-dE/T). The temperature T is multiplied by
+    cooling every cooling_every iterations, so the search settles on the
+    target from either side.
+
+    Crossing the target does not end the search. It runs until r is within
+    tolerance of the target, or until the schedule has cooled the
+    temperature below ANNEAL_FROZEN of where it started.
+
     Parameters
     ----------
-    G: nx.Graph
+    G: CompactGraph
       Graph to be rewired
 
     target_assortativity: double
       desired assortativity value
 
-    results: pandas.DataFrame
-      DataFrame to be added to. One row per iteration. Must have columns as in rewire function
+    results: ResultsRecorder
+      recorder to be added to. One row per iteration
 
     sample_size: int
-      number of edges to be rewired per iteration. The default is 2
+      number of edges proposed for rewiring per iteration, two per swap.
+      The default is 2
 
     timed: bool
-      whether or not to stop the algorithm after a certain amount of time. The default is True
+      whether or not to stop the algorithm after a certain amount of time. The default is False
 
     time_limit: double
       time after which to stop iterating. The default is 600 seconds.
 
+    tracker: AssortativityTracker
+      tracker holding the current assortativity of G. Created from G if not given
+
+    audit_every: int
+      compare the tracked assortativity with networkx every audit_every
+      iterations. The default of 0 never checks
+
+    rng: random.Random
+      source of randomness. The default is the random module
+
+    checkpoint: Checkpointer
+      writes a checkpoint whenever one is due. The default of None never does
+
+    start_iteration: int
+      iteration to carry on from when resuming from a checkpoint
+
+    elapsed: double
+      seconds already spent in this phase when resuming from a checkpoint
+
+    tolerance: double
+      stop once r is within tolerance of the target. The default of None
+      uses ANNEAL_TOLERANCE
+
+    temperature: double
+      starting temperature, in units of r. The default is the median
+      |change in r| of 1000 random proposals, and is stored with any
+      checkpoint
+
+    cooling: double
+      factor the temperature is multiplied by every cooling_every
+      iterations. The default is 0.95
+
+    cooling_every: int
+      iterations between coolings. The default is 1000
+
+    profiler: Profiler
+      charged with the time of each step of the loop. The default records
+      nothing
+
     Returns
     -------
-    G: nx.Graph
+    G: CompactGraph
       rewired graph
+    """
+    for _ in iter_anneal_rewire(G, target_assortativity, name, results, sample_size=sample_size, timed=timed, time_limit=time_limit, tracker=tracker, audit_every=audit_every, rng=rng, checkpoint=checkpoint, start_iteration=start_iteration, elapsed=elapsed, tolerance=tolerance, temperature=temperature, cooling=cooling, cooling_every=cooling_every, profiler=profiler):
+        pass
+    return G
+
 
-    results: pandas.DataFrame
-      DataFrame of results, one line per iteration
+
+def iter_anneal_rewire(G: CompactGraph, target_assortativity, name, results, sample_size = 2, timed = False, time_limit=600, tracker=None, audit_every=0, rng=random, checkpoint=None, start_iteration=None, elapsed=0, tolerance=None, temperature=None, cooling=0.95, cooling_every=1000, profiler=NULL_PROFILER):
     """
-    
-    alg_start = time.time()
-    itr = 0
-    while nx.degree_assortativity_coefficient(G) > target_assortativity:
+    Generator version of anneal_rewire, yielding the row of each iteration once
+    it is recorded. G is consistent at every yield, and closing the
+    generator stops the rewiring there
+    """
+
+    alg_start = time.time() - elapsed
+    itr = 0 if start_iteration is None else start_iteration
+    if tracker is None:
+        tracker = AssortativityTracker(G)
+    if temperature is None:
+        draws = np.random.default_rng(rng.getrandbits(64))
+        degrees = G.degree[G.edges[draws.integers(0, G.size, size=(1000, 2))].reshape(-1, 4)]
+        old_jk = degrees[:, 0]*degrees[:, 1] + degrees[:, 2]*degrees[:, 3]
+        degrees.sort(axis=1)
+        gain = np.maximum(degrees[:, 0]*degrees[:, 1] + degrees[:, 2]*degrees[:, 3] - old_jk,
+                            old_jk - degrees[:, 0]*degrees[:, 3] - degrees[:, 1]*degrees[:, 2])
+        temperature = float(np.median(tracker.delta_r(gain)))
+        if checkpoint is not None:
+            checkpoint.params['temperature'] = temperature
+    degree = tracker.degree
+    edges = G.edges
+
+    if tolerance is None:
+        tolerance = ANNEAL_TOLERANCE
+
+    def done():
+        #r is NaN on graphs such as regular graphs that no swap can change
+        return math.isnan(tracker.r) or abs(tracker.r - target_assortativity) <= tolerance
+
+    def frozen():
+        return cooling**(itr//cooling_every) < ANNEAL_FROZEN
+
+    while not done() and not frozen():
         loop_start = time.time()
         itr += 1
-        #define dictionary to track relevant info for each loop
-        row = {'name' : name,
+        row = {'name': name,
                'iteration' : itr, 
                'time' : 0, 
                'r' : 0,
@@ -343,37 +1650,53 @@ def negatively_rewire(G: nx.Graph, target_assortativity, name, results, sample_s
                'duplicate_edges': 0, 
                'self_edges': 0,
                'existing_edges': 0, 
+               'partial_swaps': 0,
                'preserved': True,
-               'method': 2,
+               'method': 4,
                'summary': 0}
 
-        edges = list(G.edges())                
-        edges_to_remove = random.sample(edges, sample_size)
-        deg_dict = {}
-        nodes = []
-        for edge in edges_to_remove:
-            for node in edge:
-                nodes.append(node)
-                deg_dict[node] = G.degree(node)
-    
-        nodes_sorted = sorted(nodes, key = deg_dict.get)
-        n_nodes = int(len(nodes_sorted)/2)
-        
-        potential_edges = [(nodes_sorted[i], nodes_sorted[len(nodes) - 1 - i]) for i in range(n_nodes)]
-        G.remove_edges_from(edges_to_remove)
-        edges_to_add, row = check_new_edges(potential_edges, G, row)
-        
-        if len(edges_to_add) == len(potential_edges):
-            G.add_edges_from(edges_to_add)
-            row['edges_rewired'] += sample_size
-        else:
-            G.add_edges_from(edges_to_remove)
-
+        T = temperature*cooling**(itr//cooling_every)
+        for _ in range(max(1, sample_size//2)):
+            p, q = rng.sample(range(G.size), 2)
+            old = edges[p].tolist() + edges[q].tolist()
+            nodes = sorted(old, key=degree.__getitem__)
+            r = tracker.r
+            if r < target_assortativity:
+                a, c, b, d = nodes
+            else:
+                a, b, d, c = nodes
+            if a == c or b == d:
+                row['self_edges'] += 1
+                continue
+            if G.has_edge(a, c) or G.has_edge(b, d):
+                row['existing_edges'] += 1
+                continue
+            delta_jk = degree[a]*degree[c] + degree[b]*degree[d] - degree[old[0]]*degree[old[1]] - degree[old[2]]*degree[old[3]]
+            rise = abs(r + tracker.delta_r(delta_jk) - target_assortativity) - abs(r - target_assortativity)
+            if rise > 0 and (T <= 0 or rng.random() >= math.exp(-rise/T)):
+                continue
+            G.replace_edge(p, a, c)
+            G.replace_edge(q, b, d)
+            tracker.shift_jk(delta_jk)
+            row['edges_rewired'] += 2
+            if done():
+                break
+        profiler.lap('swaps')
+
+        row['r'] = tracker.r
         row['time'] += time.time() - loop_start
-        row['r'] = nx.degree_assortativity_coefficient(G)
-        results.loc[len(results)] = row
+        if audit_every and itr % audit_every == 0:
+            tracker.audit(G)
+            profiler.lap('audit')
+        results.append(row)
+        profiler.lap('log')
+        if checkpoint is not None and checkpoint.due(itr):
+            checkpoint.save(G, rng, itr, results, time.time() - alg_start, 'anneal')
+            profiler.lap('checkpoint')
+        yield row
+        profiler.lap('yield')
         time_elapsed = time.time() - alg_start
-        
+
         if timed == True:
             if time_elapsed > time_limit:
                 return G
@@ -382,51 +1705,121 @@ def negatively_rewire(G: nx.Graph, target_assortativity, name, results, sample_s
 
 
 
-def rewire_negative_full(G: nx.Graph, results, name, sample_size, return_type, max_time = 600):
+def disassortative_pairing(nodes_descending, nodes_ascending, degree):
+    """
+    Greedy construction of a maximally disassortative edge set. A pointer
+    moves down the nodes from the highest degree, and each node is joined to
+    the lowest degree nodes that are still unsaturated and not yet its
+    neighbours. A second pointer over the ascending nodes skips saturated
+    nodes with next pointers compressed as they are followed, so only self
+    and existing neighbours are ever stepped over and the construction takes
+    close to O(E) steps rather than a scan of every node per node.
+
+    Parameters
+    ----------
+    nodes_descending : list
+        nodes in descending order of degree
+
+    nodes_ascending : list
+        the same nodes in ascending order of degree
+
+    degree : dict or list
+        degree each node should have in the new edge set
+
+    Returns
+    -------
+    edges : list of tuples
+        the new edges, identical to pairing each descending node with every
+        admissible ascending node in a double loop
+
+    """
+    n = len(nodes_ascending)
+    remaining = {node: degree[node] for node in nodes_ascending}
+    neighbors = {node: set() for node in nodes_ascending}
+    #nxt[j] leads to the first ascending position at or after j that may be unsaturated
+    nxt = list(range(n + 1))
+
+    def find(j):
+        while nxt[j] != j:
+            nxt[j] = nxt[nxt[j]]
+            j = nxt[j]
+        return j
+
+    edges = []
+    for node in nodes_descending:
+        j = find(0)
+        while remaining[node] > 0 and j < n:
+            target = nodes_ascending[j]
+            if remaining[target] == 0:
+                nxt[j] = j + 1
+            elif node != target and target not in neighbors[node]:
+                edges.append((node, target))
+                neighbors[node].add(target)
+                neighbors[target].add(node)
+                remaining[node] -= 1
+                remaining[target] -= 1
+                if remaining[target] == 0:
+                    nxt[j] = j + 1
+            j = find(j + 1)
+
+    return edges
+
+
+
+def rewire_negative_full(G: CompactGraph, results, name, sample_size, return_type, max_time = 600, tracker=None, rng=random, validate='off'):
     """
     removes every edge from the graph and adds them back ordered in such a way
     to minimise the assortativity.
 
     Parameters:
     -----------
-      G: nx.Graph
+      G: CompactGraph
         graph to be rewired
 
-      results: pandas.DataFrame
-        results dataframe to be passed to function requiring the columns assigned
-        in the rewiring function above
+      results: ResultsRecorder
+        results recorder to be passed to function with the columns of the
+        rewiring function above
 
       sample_size: int
         number of edges to be rewired. Relevant only for passing the result of this 
         function to another
 
+      tracker: AssortativityTracker
+        tracker holding the current assortativity of G. Created from G if not
+        given. It keeps using the degrees of G from before the rewiring
+
+      rng: random.Random
+        source of randomness for the repair. The default is the random module
+
+      validate: str
+        how the 'preserved' column is checked, see degrees_preserved. The
+        default of 'off' is O(1) per row
+
     Returns:
     --------
-      G: nx.Graph
+      G: CompactGraph
         rewired graph
 
-      results: pandas.DataFrame
-        results dataframe passed to the function with one row added per algorithm
+      results: ResultsRecorder
+        results recorder passed to the function with one row added per algorithm
         iteration
     """
-    before = degree_list(G)    
+    before = degree_list(G) if validate == 'full' else None
+    if validate != 'full':
+        #the repair checks the degrees at every iteration, so keep them tracked
+        G.track_degrees(G.reference)
     alg_start = time.time()    
-    edges_to_remove = list(G.edges())                
+    edges_to_remove = G.edge_array().copy()
     itr = 1
+    if tracker is None:
+        tracker = AssortativityTracker(G)
     #record the orginal degree of each node
-    original_degree = {}
-    nodes_descending = []
-    nodes_ascending = []
-    for edge in edges_to_remove:
-        for node in edge:
-            if node not in nodes_ascending:
-                nodes_ascending.append(node)
-                nodes_descending.append(node)
-            original_degree[node] = G.degree(node)
+    nodes = first_appearance(edges_to_remove)
+    original_degree = dict(zip(nodes.tolist(), G.degree[nodes].tolist()))
     
     #sort nodes in descending order of degree
-    nodes_descending = sorted(nodes_descending, key=original_degree.get, reverse=True)
-    nodes_ascending = sorted(nodes_ascending, key=original_degree.get, reverse=False)
+    nodes_descending = nodes[np.argsort(-G.degree[nodes], kind='stable')].tolist()
+    nodes_ascending = nodes[np.argsort(G.degree[nodes], kind='stable')].tolist()
 
     row = {'name': name,
            'iteration' : itr, 
@@ -438,45 +1831,28 @@ def rewire_negative_full(G: nx.Graph, results, name, sample_size, return_type, m
            'duplicate_edges': 0, 
            'self_edges': 0,
            'existing_edges': 0, 
+           'partial_swaps': 0,
            'preserved': True,
            'method': 1,
            'summary': 0}
 
-    #dictionary in which to record the current degree of the nodes as we add edges 
-    new_neighbors = {}
-    for node in original_degree:
-        new_neighbors[node] = set() #original_degree[node] - appearances[node]
-
-    potential_edges = []
-    for node in nodes_descending:
-        for j in range(len(nodes_ascending)):
-            target = nodes_ascending[j]
-            if len(new_neighbors[node]) < original_degree[node]:
-                if len(new_neighbors[target]) < original_degree[target]:
-                    if node != target:
-                        new_neighbors[node].add(target)
-                        new_neighbors[target].add(node)
-    
-    edges_to_add = []
-    for node in new_neighbors:
-        for target in new_neighbors[node]:
-            edges_to_add.append([node, target])
+    edges_to_add = disassortative_pairing(nodes_descending, nodes_ascending, original_degree)
     
-    G.remove_edges_from(edges_to_remove)
-    G.add_edges_from(edges_to_add)
-    row['edges_rewired'] += len(edges_to_add) 
-    row['r'] += nx.degree_assortativity_coefficient(G)
+    G.replace_edges(edges_to_add)
+    tracker.remove_edge_array(edges_to_remove)
+    tracker.add_edge_array(G.edge_array())
+    #each new edge rewires both of its ends, as counted before the pairing
+    #listed every edge once
+    row['edges_rewired'] += 2*len(edges_to_add)
+    row['r'] += tracker.r
     row['time'] += time.time() - alg_start
-    after = degree_list(G)
-    row['preserved'] = list(before) == list(after)
-    results.loc[len(results)] = row
+    row['preserved'] = degrees_preserved(G, before, validate)
+    results.append(row)
     
-    edges = list(G.edges())
-    
-    success = True
-    for node in original_degree:
-        if G.degree(node) < original_degree[node]:
-            success = False
+    #degree each node is still missing, kept up to date as edges are
+    #removed and added instead of rescanning every node
+    missing_degree = find_missing_degree(G, original_degree)
+    success = len(missing_degree) == 0
 
     while success == False:
         itr += 1
@@ -491,118 +1867,361 @@ def rewire_negative_full(G: nx.Graph, results, name, sample_size, return_type, m
                'duplicate_edges': 0, 
                'self_edges': 0,
                'existing_edges': 0, 
+               'partial_swaps': 0,
                'preserved': True,
                'method': 1,
                'summary': 0}
 
-        affected_nodes = []
-        total_degree = 0
-        missing_degree = {}
-        for node in original_degree:
-            if G.degree(node) != original_degree[node]:
-                missing_degree[node] = original_degree[node] - G.degree(node)
-                affected_nodes.append(node)
-   
-        for node in affected_nodes:
-            available_edges = 0
-            for target in affected_nodes:
-                if target != node:
-                    if target not in new_neighbors[node]:
-                        available_edges += 1
-    
-        stubs1 = []
-        stubs2 = []
-        for node in missing_degree:
-            j = 0
-            while j < missing_degree[node]:
-                stubs1.append(node)
-                j += 1
-       
-        edges = list(G.edges())
-        while len(stubs2) < len(stubs1):
-            edge_to_remove = random.choice(edges)
-            if edge_to_remove[0] not in stubs1:
-                if edge_to_remove[1] not in stubs1:
-                    if G.has_edge(edge_to_remove[0], edge_to_remove[1]) == True:
-                        stubs2.append(edge_to_remove[0])
-                        stubs2.append(edge_to_remove[1])
-                        G.remove_edge(edge_to_remove[0], edge_to_remove[1])
-            edges.remove(edge_to_remove)
+        stubs1, stubs2 = release_stubs(G, missing_degree, tracker, rng)
+        #every edge left touches a node missing degree, so later rounds
+        #cannot free the stubs needed either
+        stuck = len(stubs2) < len(stubs1)
 
         stubs1 = sorted(stubs1, key = original_degree.get, reverse=False)
         stubs2 = sorted(stubs2, key = original_degree.get, reverse=True)
         for u, v in zip(stubs1, stubs2):
-            G.add_edge(u, v)
+            if G.add_edge(u, v):
+                tracker.add_edges([(u, v)])
+                for node in (u, v):
+                    missing_degree[node] -= 1
+                    if missing_degree[node] == 0:
+                        del missing_degree[node]
             row['edges_rewired'] += 1 
         
-        fails = 0
-        for node in original_degree:
-            if G.degree(node) != original_degree[node]:
-                fails += 1
-        
-        if fails > 0:
-            success = False
-        else:
-            success = True
+        success = len(missing_degree) == 0
          
-        row['r'] += nx.degree_assortativity_coefficient(G)
+        row['r'] += tracker.r
         row['time'] += time.time() - start
-        after = degree_list(G)
-        row['preserved'] = list(before) == list(after)
+        row['preserved'] = degrees_preserved(G, before, validate)
         if return_type == 'full':
-            results.loc[len(results)] = row
+            results.append(row)
 
+        if stuck and not success:
+            break
         if time.time() - alg_start > max_time:
             break
     
-    results.loc[len(results)] = row
+    results.append(row)
+    G.set_tracking(False)
     
     return G
 
 
 
-def rewire_positive_full(G: nx.Graph, results, name, sample_size, return_type, max_time = 600):
+def extreme_phase(G, direction, results, name, sample_size, return_type, tracker, rng=random, cache=None, validate='off'):
+    """
+    Rewires G to its most assortative ('max') or most disassortative ('min')
+    configuration with rewire_positive_full or rewire_negative_full, or
+    takes the configuration from cache if it holds one for the degree
+    sequence of G. A configuration that is built is stored in the cache,
+    unless its repair stopped before every degree was restored.
+
+    The configuration is built with its own random stream, seeded by one
+    draw from rng whether or not the cache holds it, so a seeded run goes
+    on the same way after a cache hit as after a miss.
+
+    Parameters
+    ----------
+    as for rewire_positive_full, with
+
+    direction : str
+        'max' or 'min'
+
+    cache : ExtremeCache
+        cache to use. The default of None always builds the configuration
+
+    Returns
+    -------
+    G: CompactGraph
+        rewired graph
+    """
+    start = time.time()
+    own_rng = random.Random(rng.getrandbits(64))
+    if G.reference is None:
+        G.track_degrees(tracking=False)
+    edges, r = (None, None) if cache is None else cache.get(G, direction)
+    if edges is None:
+        if direction == 'max':
+            G = rewire_positive_full(G, results, name, sample_size, return_type, tracker=tracker, rng=own_rng, validate=validate)
+        else:
+            G = rewire_negative_full(G, results, name, sample_size, return_type, tracker=tracker, rng=own_rng, validate=validate)
+        if cache is not None and G.degrees_match():
+            cache.put(G, direction, tracker.r)
+        return G
+
+    tracker.remove_edge_array(G.edge_array())
+    G.replace_edges(edges)
+    tracker.add_edge_array(G.edge_array())
+    results.append({'name': name,
+                    'iteration': 1,
+                    'time': time.time() - start,
+                    'r': tracker.r,
+                    'target_r': 0,
+                    'sample_size': sample_size,
+                    'edges_rewired': 2*G.size,
+                    'duplicate_edges': 0,
+                    'self_edges': 0,
+                    'existing_edges': 0,
+                    'partial_swaps': 0,
+                    'preserved': True,
+                    'method': 1,
+                    'summary': 0})
+    return G
+
+
+
+def assortativity_range(G, cache=None, rng=random):
+    """
+    The lowest and highest assortativity reached by the extreme
+    configurations of the degree sequence of G, built by
+    rewire_negative_full and rewire_positive_full on a copy of G. With a
+    cache holding both configurations this needs no rewiring at all.
+
+    Parameters
+    ----------
+    G : networkx.Graph, numpy.ndarray, scipy.sparse matrix or CompactGraph
+        graph whose degree sequence is used. It is left as it is
+
+    cache : ExtremeCache or bool
+        cache to look the configurations up in and store them in. True uses
+        the shared EXTREME_CACHE
+
+    rng : random.Random
+        source of the seeds of the configurations built. One seed is drawn
+        for each configuration whether or not the cache holds it
+
+    Returns
+    -------
+    low, high : floats
+        the assortativity of the most disassortative and most assortative
+        configurations. None for a configuration whose repair stopped before
+        every degree was restored, as it is not a bound
+    """
+    if cache is True:
+        cache = EXTREME_CACHE
+    G = CompactGraph.from_graph(G)
+    bounds = []
+    for direction in ('min', 'max'):
+        own_rng = random.Random(rng.getrandbits(64))
+        r = None
+        if cache:
+            _, r = cache.get(G, direction)
+        if r is None:
+            work = CompactGraph(G.n_nodes, G.edge_array(), G.labels)
+            tracker = AssortativityTracker(work)
+            extreme_phase(work, direction, ResultsRecorder(log='none'), '', 2, 'summary', tracker, own_rng, cache or None)
+            r = tracker.r if work.degrees_match() else None
+        bounds.append(r)
+    return bounds[0], bounds[1]
+
+
+
+def first_appearance(edges):
+    """
+    Parameters
+    ----------
+    edges : np.ndarray of shape (E, 2)
+        edges as pairs of node indices
+
+    Returns
+    -------
+    np.ndarray
+        the nodes of the edges in the order they first appear in them, as
+        when iterating over the edges of a networkx.Graph
+
+    """
+    nodes, first = np.unique(edges.ravel(), return_index=True)
+    return nodes[np.argsort(first, kind='stable')]
+
+
+
+def assortative_pairing(nodes, degree):
+    """
+    Greedy construction of a maximally assortative edge set. Each node in
+    turn is joined to the following unsaturated nodes, in order, until it
+    has its full degree. Saturated nodes are skipped with next pointers
+    compressed as they are followed, so the construction takes close to
+    O(E) steps rather than visiting every pair of nodes.
+
+    Parameters
+    ----------
+    nodes : list
+        nodes in descending order of degree
+
+    degree : dict or list
+        degree each node should have in the new edge set
+
+    Returns
+    -------
+    edges : list of tuples
+        the new edges, identical to pairing each node with the unsaturated
+        nodes after it in a double loop over nodes
+
+    """
+    n = len(nodes)
+    remaining = [degree[node] for node in nodes]
+    #nxt[i] leads to the first unsaturated position at or after i
+    nxt = list(range(n + 1))
+
+    def find(i):
+        while nxt[i] != i:
+            nxt[i] = nxt[nxt[i]]
+            i = nxt[i]
+        return i
+
+    edges = []
+    for i in range(n):
+        if remaining[i] == 0:
+            continue
+        j = find(i + 1)
+        while remaining[i] > 0 and j < n:
+            edges.append((nodes[i], nodes[j]))
+            remaining[i] -= 1
+            remaining[j] -= 1
+            if remaining[j] == 0:
+                nxt[j] = j + 1
+            j = find(j + 1)
+        nxt[i] = i + 1
+
+    return edges
+
+
+
+def find_missing_degree(G, original_degree):
+    """
+    Parameters
+    ----------
+    G : CompactGraph
+        graph being repaired
+
+    original_degree : dict
+        degree each node should have
+
+    Returns
+    -------
+    missing_degree : dict
+        degree missing from each node that has fewer edges than it should
+
+    """
+    nodes = np.fromiter(original_degree.keys(), dtype=np.int64, count=len(original_degree))
+    wanted = np.fromiter(original_degree.values(), dtype=np.int64, count=len(original_degree))
+    missing = wanted - G.degree[nodes]
+    short = np.flatnonzero(missing > 0)
+    return dict(zip(nodes[short].tolist(), missing[short].tolist()))
+
+
+
+def release_stubs(G, missing_degree, tracker, rng=random):
+    """
+    Removes random edges away from the nodes missing degree to free up stubs
+    for them to be joined to. Edges are drawn from the edge array of G and
+    redrawn if they touch a node missing degree, so a round costs time in
+    proportion to the missing degree rather than to the size of the graph.
+    Once every edge left has been drawn and touches a node missing degree,
+    no more stubs can be freed and stubs2 is returned shorter than stubs1.
+
+    Parameters
+    ----------
+    G : CompactGraph
+        graph being repaired, edited in place
+
+    missing_degree : dict
+        degree missing from each node. The endpoints of the removed edges are
+        added to it
+
+    tracker : AssortativityTracker
+        tracker of G, updated with the removed edges
+
+    rng : random.Random
+        source of randomness. The default is the random module
+
+    Returns
+    -------
+    stubs1 : list
+        each node missing degree, repeated once per missing edge
+
+    stubs2 : list
+        the endpoints of the removed edges. Shorter than stubs1 if not
+        enough edges could be removed, in which case the repair cannot
+        finish
+
+    """
+    stubs1 = []
+    for node, missing in missing_degree.items():
+        stubs1.extend([node]*missing)
+    stub_nodes = set(missing_degree)
+
+    stubs2 = []
+    rejected = set()
+    while len(stubs2) < len(stubs1) and len(rejected) < G.size:
+        u, v = G.edges[rng.randrange(G.size)].tolist()
+        if u in stub_nodes or v in stub_nodes:
+            rejected.add(G.key(u, v))
+            continue
+        stubs2.append(u)
+        stubs2.append(v)
+        G.remove_edge(u, v)
+        tracker.remove_edges([(u, v)])
+        for node in (u, v):
+            missing_degree[node] = missing_degree.get(node, 0) + 1
+
+    return stubs1, stubs2
+
+
+
+def rewire_positive_full(G: CompactGraph, results, name, sample_size, return_type, max_time = 600, tracker=None, rng=random, validate='off'):
     """
     removes every edge from the graph and adds them back ordered in such a way
     to maximise the assortativity.
 
     Parameters:
-      G: nx.Graph
+      G: CompactGraph
         graph to be rewired
 
-      results: pandas.DataFrame
-        results dataframe to be passed to function requiring the columns assigned
-        in the rewiring function above
+      results: ResultsRecorder
+        results recorder to be passed to function with the columns of the
+        rewiring function above
 
       sample_size: int
         number of edges to be rewired. Relevant only for passing the result of this 
         function to another
+
+      tracker: AssortativityTracker
+        tracker holding the current assortativity of G. Created from G if not
+        given. It keeps using the degrees of G from before the rewiring
+
+      rng: random.Random
+        source of randomness for the repair. The default is the random module
+
+      validate: str
+        how the 'preserved' column is checked, see degrees_preserved. The
+        default of 'off' is O(1) per row
     
     Returns:
     --------
-      G: nx.Graph
+      G: CompactGraph
         rewired graph
 
-      results: pandas.DataFrame
-        results dataframe passed to the function with one row added per algorithm
+      results: ResultsRecorder
+        results recorder passed to the function with one row added per algorithm
         iteration
     """
     itr = 1
-    before = degree_list(G)    
+    before = degree_list(G) if validate == 'full' else None
+    if validate != 'full':
+        #the repair checks the degrees at every iteration, so keep them tracked
+        G.track_degrees(G.reference)
     alg_start = time.time()    
-    edges_to_remove = list(G.edges())                
+    edges_to_remove = G.edge_array().copy()
      
+    if tracker is None:
+        tracker = AssortativityTracker(G)
     #record the orginal degree of each node
-    original_degree = {}
-    nodes = []
-    for edge in edges_to_remove:
-        for node in edge:
-            if node not in nodes:
-                nodes.append(node)
-            original_degree[node] = G.degree(node)
+    nodes = first_appearance(edges_to_remove)
+    original_degree = dict(zip(nodes.tolist(), G.degree[nodes].tolist()))
     
     #sort nodes in descending order of degree
-    nodes = sorted(nodes, key=original_degree.get, reverse=True)
+    nodes = nodes[np.argsort(-G.degree[nodes], kind='stable')].tolist()
 
     row = {'name' : name,
            'iteration' : itr, 
@@ -614,46 +2233,29 @@ def rewire_positive_full(G: nx.Graph, results, name, sample_size, return_type, m
            'duplicate_edges': 0, 
            'self_edges': 0,
            'existing_edges': 0, 
+           'partial_swaps': 0,
            'preserved': True,
            'method': 1,
            'summary': 0}
 
-    #dictionary in which to record the current neighbors of the nodes as we add edges 
-    new_neighbors = {}
-    for node in original_degree:
-        new_neighbors[node] = set()
-
-
-    potential_edges = []
-    for ind, node in enumerate(nodes):
-        for target in nodes[ind:]:
-            if len(new_neighbors[node]) < original_degree[node]:
-                if len(new_neighbors[target]) < original_degree[target]:
-                    if node != target:
-                        new_neighbors[node].add(target)
-                        new_neighbors[target].add(node)
-    
-    edges_to_add = []
-    for node in new_neighbors:
-        for target in new_neighbors[node]:
-            edges_to_add.append([node, target])
+    edges_to_add = assortative_pairing(nodes, original_degree)
     
-    G.remove_edges_from(edges_to_remove)
-    G.add_edges_from(edges_to_add)
-    row['edges_rewired'] += len(edges_to_add)
-    row['r'] += nx.degree_assortativity_coefficient(G)
+    G.replace_edges(edges_to_add)
+    tracker.remove_edge_array(edges_to_remove)
+    tracker.add_edge_array(G.edge_array())
+    #each new edge rewires both of its ends, as counted before the pairing
+    #listed every edge once
+    row['edges_rewired'] += 2*len(edges_to_add)
+    row['r'] += tracker.r
     row['time'] += time.time() - alg_start
-    after = degree_list(G)
-    row['preserved'] = list(before) == list(after)
-    results.loc[len(results)] = row
+    row['preserved'] = degrees_preserved(G, before, validate)
+    results.append(row)
     
-    edges = list(G.edges())
-    
-    #check to ensure that we have maintained the degree sequence
-    success = True
-    for node in original_degree:
-        if G.degree(node) < original_degree[node]:
-            success = False
+    #check to ensure that we have maintained the degree sequence. The degree
+    #each node is still missing is kept up to date as edges are removed and
+    #added instead of rescanning every node
+    missing_degree = find_missing_degree(G, original_degree)
+    success = len(missing_degree) == 0
 
     #if degree sequence has not been maintained, find the nodes with incorrect
     #degree and remove edges to rewire to them
@@ -672,79 +2274,51 @@ def rewire_positive_full(G: nx.Graph, results, name, sample_size, return_type, m
                'duplicate_edges': 0, 
                'self_edges': 0,
                'existing_edges': 0, 
+               'partial_swaps': 0,
                'preserved': True,
                'method': 1,
                'summary': 0}
 
-        affected_nodes = []
-        total_degree = 0
-        missing_degree = {}
-        
-        for node in original_degree:
-            if G.degree(node) != original_degree[node]:
-                missing_degree[node] = original_degree[node] - G.degree(node)
-                affected_nodes.append(node)
-        
-        for node in affected_nodes:
-            available_edges = 0
-            for target in affected_nodes:
-                if target != node:
-                    if target not in new_neighbors[node]:
-                        available_edges += 1
-    
-        stubs1 = []
-        stubs2 = []
-        for node in missing_degree:
-            j = 0
-            while j < missing_degree[node]:
-                stubs1.append(node)
-                j += 1
-
-        edges = list(G.edges())
-        while len(stubs2) < len(stubs1):
-            edge_to_remove = random.choice(edges)
-            if edge_to_remove[0] not in stubs1:
-                if edge_to_remove[1] not in stubs1:
-                    if G.has_edge(edge_to_remove[0], edge_to_remove[1]) == True:
-                        stubs2.append(edge_to_remove[0])
-                        stubs2.append(edge_to_remove[1])
-                        G.remove_edge(edge_to_remove[0], edge_to_remove[1])
-            edges.remove(edge_to_remove)
+        stubs1, stubs2 = release_stubs(G, missing_degree, tracker, rng)
+        #every edge left touches a node missing degree, so later rounds
+        #cannot free the stubs needed either
+        stuck = len(stubs2) < len(stubs1)
 
         stubs1 = sorted(stubs1, key = original_degree.get, reverse=False)
         stubs2 = sorted(stubs2, key = original_degree.get, reverse=False)
         for u, v in zip(stubs1, stubs2):
-            G.add_edge(u, v)
+            if G.add_edge(u, v):
+                tracker.add_edges([(u, v)])
+                for node in (u, v):
+                    missing_degree[node] -= 1
+                    if missing_degree[node] == 0:
+                        del missing_degree[node]
             row['edges_rewired'] += 1
         
-        fails = 0
-        for node in original_degree:
-            if G.degree(node) != original_degree[node]:
-                fails += 1
-        
-        if fails > 0:
-            success = False
-        else:
-            success = True
+        success = len(missing_degree) == 0
     
-        row['r'] += nx.degree_assortativity_coefficient(G)
+        row['r'] += tracker.r
         row['time'] += time.time() - start
-        after = degree_list(G)
-        row['preserved'] = list(before) == list(after)
-        results.loc[len(results)] = row
+        row['preserved'] = degrees_preserved(G, before, validate)
+        results.append(row)
         if return_type == 'full':
-            results.loc[len(results)] = row
+            results.append(row)
 
+        if stuck and not success:
+            break
         if time.time() - alg_start > max_time:
             break
 
-    results.loc[len(results)] = row
+    results.append(row)
+    G.set_tracking(False)
     return G
 
 
 def test_sample_sizes(G, results, name, sample_size, n_tests):
 
     j = 0
+    pool = CompactGraph.from_graph(G)
+    recorder = ResultsRecorder(SAMPLE_SIZE_COLUMNS)
 
     while j < n_tests:
         #define dictionary to track relevant info for each loop
@@ -755,37 +2329,199 @@ def test_sample_sizes(G, results, name, sample_size, n_tests):
                'existing_edges': 0,
                'success': True} 
 
-        edges = list(G.edges())                
-        edges_to_remove = random.sample(edges, sample_size)
+        edges_to_remove = pool.sample_edges(sample_size)
         deg_dict = {}
         nodes = []
         for edge in edges_to_remove:
             for node in edge:
                 nodes.append(node)
-                deg_dict[node] = G.degree(node)
+                deg_dict[node] = pool.degree[node]
     
         nodes_sorted = sorted(nodes, key=deg_dict.get)
         potential_edges = [[nodes_sorted[i], nodes_sorted[i+1]] for i in range(0,len(nodes_sorted),2)]
-        G.remove_edges_from(edges_to_remove)
-                
-        edges_to_add = []
-        for edge in potential_edges:
-            if G.has_edge(edge[0], edge[1]) == False:
-                if edge[0] != edge[1]:
-                    if [edge[1], edge[0]] not in potential_edges:
-                        if potential_edges.count(edge) == 1:
-                            edges_to_add.append(edge)
-                        else:
-                            row['duplicate_edges'] += 0.5
-                    else:
-                        row['duplicate_edges'] += 0.5
-                else:
-                    row['self_edges'] += 1
-            else:
-                row['existing_edges'] += 1
-                row['success'] = False
+        pool.remove_edges(edges_to_remove)
+        edges_to_add, row = check_new_edges(potential_edges, pool, row)
+        row['success'] = row['existing_edges'] == 0
 
-        results.loc[len(results)] = row
-        G.add_edges_from(edges_to_remove)
+        recorder.append(row)
+        pool.add_edges(edges_to_remove)
         j += 1
+
+    #the rows are added to the caller's DataFrame in place, as callers rely on
+    for row in recorder.to_frame().to_dict('records'):
+        results.loc[len(results)] = row
     return results
+
+
+
+def simulate_samples(G, sample_size, n_trials, assortative, draws):
+    """
+    Draws n_trials samples of sample_size edges at once and works out, as
+    arrays, whether the grouped rewiring of positively_rewire or
+    negatively_rewire would accept each of them and by how much it would
+    change the sum of j*k over the edges. Nothing is rewired.
+
+    Parameters
+    ----------
+    G : CompactGraph
+        graph to sample from
+
+    sample_size : int
+        number of edges in each sample
+
+    n_trials : int
+        number of samples to draw. Each sample draws distinct edges, as
+        G.sample_edges does
+
+    assortative : bool
+        pair the nodes as positively_rewire does if True, as
+        negatively_rewire does if False
+
+    draws : numpy.random.Generator
+        source of randomness
+
+    Returns
+    -------
+    success : np.ndarray of bools
+        whether every potential edge of each sample is valid
+
+    delta_jk : np.ndarray
+        change in the sum of j*k each sample would make if accepted
+
+    """
+    if sample_size > G.size or n_trials < 1:
+        return np.zeros(0, dtype=bool), np.zeros(0, dtype=np.int64)
+    slots = draws.integers(0, G.size, size=(n_trials, sample_size))
+    ordered = np.sort(slots, axis=1)
+    #samples drawing a slot twice are drawn again without replacement, so
+    #that large samples of small graphs are not all lost
+    for i in np.flatnonzero((ordered[:, 1:] == ordered[:, :-1]).any(axis=1)).tolist():
+        slots[i] = draws.choice(G.size, sample_size, replace=False)
+    old = G.edges[slots].astype(np.int64)
+    nodes = old.reshape(len(slots), -1)
+    degree = G.degree[nodes]
+    order = np.argsort(degree, axis=1, kind='stable')
+    nodes = np.take_along_axis(nodes, order, axis=1)
+    degree = np.take_along_axis(degree, order, axis=1)
+    if assortative:
+        new = nodes.reshape(len(slots), sample_size, 2)
+        new_degree = degree.reshape(len(slots), sample_size, 2)
+    else:
+        new = np.stack((nodes[:, :sample_size], nodes[:, ::-1][:, :sample_size]), axis=2)
+        new_degree = np.stack((degree[:, :sample_size], degree[:, ::-1][:, :sample_size]), axis=2)
+    old_degree = G.degree[old]
+    delta_jk = (new_degree[:, :, 0]*new_degree[:, :, 1]).sum(axis=1) - (old_degree[:, :, 0]*old_degree[:, :, 1]).sum(axis=1)
+
+    n = G.n_nodes
+    keys = new.min(axis=2)*n + new.max(axis=2)
+    removed = old.min(axis=2)*n + old.max(axis=2)
+    self_edges = new[:, :, 0] == new[:, :, 1]
+    ordered = np.sort(keys, axis=1)
+    duplicates = (ordered[:, 1:] == ordered[:, :-1]).any(axis=1)
+    exists = G.has_edges(keys)
+    #the sampled edges are removed before the potential edges are checked
+    exists &= ~(keys[:, :, None] == removed[:, None, :]).any(axis=2)
+    success = ~(self_edges.any(axis=1) | duplicates | exists.any(axis=1))
+    return success, delta_jk
+
+
+
+def tune_sample_size(G, direction, budget_seconds = 1.0, sample_sizes = SAMPLE_SIZE_CANDIDATES, rng = random, return_table = False):
+    """
+    Picks the sample size with which the grouped rewiring of the fine tuning
+    phase moves r fastest in the given direction on G as it is now.
+
+    For each candidate size, a vectorised Monte Carlo of many samples gives
+    the rate at which the rewiring would be accepted and the expected change
+    in r per iteration, and a few real iterations, each put back afterwards,
+    give the time an iteration takes. The size with the largest expected
+    change in r per second is chosen. This is the decision test_sample_sizes
+    leaves to the user.
+
+    Parameters
+    ----------
+    G : CompactGraph, networkx.Graph, numpy.ndarray or scipy.sparse matrix
+        graph to tune for. It is left as it is
+
+    direction : str
+        'positive' to tune positively_rewire, 'negative' to tune
+        negatively_rewire
+
+    budget_seconds : float
+        roughly how long to spend tuning, shared between the sizes. The
+        default is 1 second
+
+    sample_sizes : sequence of ints
+        candidate sizes. Sizes larger than the number of edges are skipped
+
+    rng : random.Random
+        source of randomness. The default is the random module
+
+    return_table : bool
+        also return the estimates for every size
+
+    Returns
+    -------
+    sample_size : int
+        the best size. 2 if no size is expected to move r at all
+
+    table : pandas.DataFrame
+        columns sample_size, success_rate, delta_r, seconds_per_iteration and
+        delta_r_per_second, one row per size. Only returned if return_table
+        is True
+
+    """
+    G = CompactGraph.from_graph(G)
+    assortative = direction == 'positive'
+    sign = 1 if assortative else -1
+    tracker = AssortativityTracker(G)
+    mean = tracker.sum_j/(2*tracker.m)
+    scale = tracker.m*(tracker.sum_j2/(2*tracker.m) - mean**2)
+    sizes = [size for size in sample_sizes if size <= G.size]
+    draws = np.random.default_rng(rng.getrandbits(64))
+    share = budget_seconds/max(len(sizes), 1)
+
+    table = {'sample_size': [], 'success_rate': [], 'delta_r': [], 'seconds_per_iteration': [], 'delta_r_per_second': []}
+    for size in sizes:
+        start = time.time()
+        row = {'duplicate_edges': 0, 'self_edges': 0, 'existing_edges': 0}
+        iterations = 0
+        while iterations < 3 or time.time() - start < share/2:
+            edges_to_remove = G.sample_edges(size, rng)
+            nodes = [node for edge in edges_to_remove for node in edge]
+            nodes_sorted = sorted(nodes, key=lambda node: G.degree[node])
+            if assortative:
+                potential_edges = [[nodes_sorted[i], nodes_sorted[i+1]] for i in range(0, len(nodes_sorted), 2)]
+            else:
+                potential_edges = [(nodes_sorted[i], nodes_sorted[len(nodes) - 1 - i]) for i in range(size)]
+            G.remove_edges(edges_to_remove)
+            check_new_edges(potential_edges, G, row)
+            G.add_edges(edges_to_remove)
+            iterations += 1
+        seconds = (time.time() - start)/iterations
+
+        successes = 0
+        gain = 0
+        trials = 0
+        start = time.time()
+        while trials < 100 or time.time() - start < share/2:
+            success, delta_jk = simulate_samples(G, size, max(1, 20000//size), assortative, draws)
+            successes += int(success.sum())
+            gain += sign*int(delta_jk[success].sum())
+            trials += len(success)
+        delta_r = gain/max(trials, 1)/scale if scale > 0 else 0.0
+
+        table['sample_size'].append(size)
+        table['success_rate'].append(successes/max(trials, 1))
+        table['delta_r'].append(delta_r)
+        table['seconds_per_iteration'].append(seconds)
+        table['delta_r_per_second'].append(delta_r/seconds)
+
+    table = pd.DataFrame(table)
+    if len(table) == 0 or table['delta_r_per_second'].max() <= 0:
+        best = 2
+    else:
+        best = int(table['sample_size'][table['delta_r_per_second'].idxmax()])
+    if return_table:
+        return best, table
+    return best
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+Rewiring one graph to a whole list of target assortativities along a single
+trajectory.
+
+@author: shane
+"""
+
+import random
+import numpy as np
+
+from .assortativity import AssortativityTracker
+from .compact_graph import CompactGraph
+from .results import ResultsRecorder
+from .extreme_cache import EXTREME_CACHE
+from .rewiring_functions import degree_list, finish_rewire, positively_rewire, negatively_rewire, extreme_phase
+
+
+def rewire_sweep(G, targets, name, sample_size = 2, start = 'graph', timed = False, time_limit = 600, seed = None, tolerance = None, batch_size = None, accept = 'all', audit_every = 0, cache = None):
+    """
+    Rewires a graph through every target assortativity in turn, yielding a
+    snapshot each time r reaches one, instead of calling rewire once per
+    target from a fresh copy.
+
+    The targets are sorted and walked monotonically with the fine tuning of
+    the 'original' method, each one carrying on from the graph left by the
+    previous one, so a sweep costs about as much as a single rewiring to
+    the furthest target.
+
+    Parameters
+    ----------
+    G : networkx.Graph, numpy.ndarray of shape (E, 2), scipy.sparse matrix or CompactGraph
+        graph to be rewired. It is left as it is
+
+    targets : float or list of floats
+        target assortativities
+
+    name : str
+        name to appear in the results
+
+    sample_size : int
+        number of edges to rewire at each iteration. The default is 2
+
+    start : str
+        where the trajectory starts
+            'graph' : from G, walking up through the targets above its r and
+            then, from G again, down through the targets below it
+
+            'max' : from the most assortative graph found by
+            rewire_positive_full, walking down through every target
+
+            'min' : from the most disassortative graph found by
+            rewire_negative_full, walking up through every target
+
+    timed : bool
+        whether to limit the time spent reaching each target
+
+    time_limit : float
+        time limit for each target if timed
+
+    seed : int
+        seed of the random.Random instance the rewiring draws from. By
+        default the random module is used
+
+    tolerance, batch_size, accept, audit_every :
+        as for rewire
+
+    cache : ExtremeCache or bool
+        cache the extreme configuration of start 'max' or 'min' is taken
+        from, or stored in. True uses the shared EXTREME_CACHE
+
+    Yields
+    ------
+    target : float
+        the target just reached
+
+    edges : np.ndarray
+        (E, 2) array of node labels of the graph when r reached the target
+
+    results : pandas.DataFrame
+        the rows recorded since the previous snapshot, with the columns of
+        rewire, ending with a summary row for this target
+
+    """
+    targets = sorted(np.atleast_1d(targets).tolist())
+    if isinstance(G, CompactGraph):
+        G = CompactGraph(G.n_nodes, G.edge_array(), G.labels)
+    else:
+        G = CompactGraph.from_graph(G)
+    rng = random if seed is None else random.Random(seed)
+    if cache is True:
+        cache = EXTREME_CACHE
+    tracker = AssortativityTracker(G)
+    before = degree_list(G)
+    options = dict(tracker=tracker, audit_every=audit_every, rng=rng, tolerance=tolerance,
+                   batch_size=batch_size, accept=accept)
+
+    def start_recorder(iteration, target):
+        #new recorder whose first row describes the graph as it is now
+        results = ResultsRecorder()
+        results.append({'name': name,
+                        'iteration': iteration,
+                        'time': 0,
+                        'r': tracker.r,
+                        'target_r': target,
+                        'sample_size': sample_size,
+                        'edges_rewired': 0,
+                        'duplicate_edges': 0,
+                        'self_edges': 0,
+                        'existing_edges': 0,
+                        'partial_swaps': 0,
+                        'preserved': True,
+                        'method': 0,
+                        'summary': 0})
+        return results
+
+    if start == 'graph':
+        origin = G.edge_array().copy()
+        r = tracker.r
+        walks = [(positively_rewire, [t for t in targets if t >= r]),
+                 (negatively_rewire, [t for t in targets if t < r][::-1])]
+    elif start == 'max':
+        walks = [(negatively_rewire, targets[::-1])]
+    elif start == 'min':
+        walks = [(positively_rewire, targets)]
+    else:
+        raise ValueError("start must be 'graph', 'max' or 'min'")
+
+    for w, (fine_tune, walk_targets) in enumerate(walks):
+        if not walk_targets:
+            continue
+        if w > 0:
+            G.replace_edges(origin)
+            tracker = AssortativityTracker(G)
+            options['tracker'] = tracker
+        iteration = 0
+        results = start_recorder(iteration, walk_targets[0])
+        if start in ('max', 'min'):
+            G = extreme_phase(G, start, results, name, sample_size, 'full', tracker, rng, cache or None)
+
+        for i, target in enumerate(walk_targets):
+            if i > 0:
+                results = start_recorder(iteration, target)
+            G = fine_tune(G, target, name, results, sample_size, timed, time_limit,
+                          start_iteration=int(results.last('iteration')), **options)
+            iteration = int(results.last('iteration'))
+            _, frame = finish_rewire(G, G, results, tracker, before, target, sample_size, 'original', 'full')
+            yield target, G.labelled_edges(), frame
@@ -0,0 +1,307 @@
+# -*- coding: utf-8 -*-
+"""
+Regression tests for the rewiring functions.
+
+Run from the top of the repository with
+    python -m pytest tests
+
+@author: shane
+"""
+
+import time
+import random
+import networkx as nx
+import numpy as np
+import pandas as pd
+import pytest
+from degree_preserving_rewiring import tune_sample_size, rewire, rewire_iter, resume_rewire, rewire_ensemble
+from degree_preserving_rewiring.dpr.src.compact_graph import CompactGraph
+from degree_preserving_rewiring.dpr.src.results import ResultsRecorder
+from degree_preserving_rewiring.dpr.src.extreme_cache import ExtremeCache
+from degree_preserving_rewiring.dpr.src.cdf_tables import build_cdf, CDFCache
+from degree_preserving_rewiring.dpr.src.generate_graphs_itm import sample_degrees
+from degree_preserving_rewiring.dpr.src import rewiring_functions
+from degree_preserving_rewiring.dpr.src.rewiring_functions import simulate_samples, rewire_positive_full, degrees_preserved, VALIDATE_EVERY, \
+    assortative_pairing, disassortative_pairing
+
+
+def test_simulate_samples_large_sample_of_small_graph():
+    #almost every sample of 64 of the 396 edges draws some edge twice
+    G = CompactGraph.from_graph(nx.barabasi_albert_graph(200, 2, seed=1))
+    success, delta_jk = simulate_samples(G, 64, 300, True, np.random.default_rng(0))
+    assert len(success) == len(delta_jk) == 300
+
+
+def test_tune_sample_size_small_ba_graph():
+    G = nx.barabasi_albert_graph(200, 2, seed=1)
+    best, table = tune_sample_size(G, 'positive', 0.2, rng=random.Random(0), return_table=True)
+    assert best in list(table['sample_size'])
+    assert table['success_rate'].notna().all()
+
+
+def test_rewire_auto_sample_size_small_ba_graph():
+    G = nx.barabasi_albert_graph(200, 2, seed=1)
+    degrees = sorted(d for _, d in G.degree())
+    G, results = rewire(G, 0.1, 'ba', sample_size='auto', method='new', seed=1)
+    assert sorted(d for _, d in G.degree()) == degrees
+    #the tuned sample size depends on timings, so only the crossing is fixed
+    assert results['r'].iloc[-1] <= 0.1
+
+
+def test_tolerance_lands_inside_band():
+    for seed in range(10):
+        G = nx.barabasi_albert_graph(60, 2, seed=seed)
+        for method in ('original', 'greedy'):
+            _, results = rewire(G.copy(), -0.2, 'ba', method=method, tolerance=0.005, seed=seed,
+                                timed=True, time_limit=10)
+            assert abs(results['r'].iloc[-1] + 0.2) <= 0.005
+
+
+def test_repair_that_cannot_finish_stops_at_once():
+    #dense graph whose assortative configuration cannot be repaired
+    edges = [(0, 1), (0, 3), (0, 4), (0, 5), (1, 2), (1, 3), (1, 5), (2, 3), (2, 4), (2, 5), (3, 4), (3, 5), (4, 5)]
+    G = CompactGraph.from_graph(nx.Graph(edges))
+    G.track_degrees(tracking=False)
+    results = ResultsRecorder()
+    start = time.time()
+    rewire_positive_full(G, results, 'dense', 2, 'full', max_time=60, rng=random.Random(0))
+    assert time.time() - start < 1
+    assert not G.degrees_match()
+    assert not results.last_row['preserved']
+
+
+def test_regular_graph_stops_at_once():
+    #r is NaN on a regular graph and no swap can change it
+    G = nx.random_regular_graph(3, 50, seed=1)
+    for method in ('new', 'original', 'greedy', 'anneal'):
+        for target in (0.2, -0.2):
+            out, results = rewire(G.copy(), target, 'regular', method=method, seed=1)
+            assert sorted(d for _, d in out.degree()) == [3]*50
+            assert results['summary'].iloc[-1] == 1
+
+
+def test_rewired_networkx_graph_keeps_untouched_edge_attributes():
+    G = nx.barabasi_albert_graph(300, 2, seed=1)
+    nx.set_edge_attributes(G, 1.5, 'weight')
+    before = set(map(frozenset, G.edges()))
+    out, _ = rewire(G, 0.1, 'ba', method='original', seed=1)
+    assert out is G
+    kept = [tuple(edge) for edge in before & set(map(frozenset, out.edges()))]
+    assert kept
+    assert all(out.edges[edge].get('weight') == 1.5 for edge in kept)
+
+
+def test_sample_sizes_appends_to_the_callers_frame():
+    G = nx.barabasi_albert_graph(300, 2, seed=1)
+    results = pd.DataFrame(columns=['name', 'sample_size', 'duplicate_edges', 'self_edges', 'existing_edges', 'success'])
+    #imported through its module so that pytest does not collect it
+    rewiring_functions.test_sample_sizes(G, results, 'ba', 4, 50)
+    rewiring_functions.test_sample_sizes(G, results, 'ba', 8, 20)
+    assert len(results) == 70
+    assert list(results['sample_size'].iloc[[0, -1]]) == [4, 8]
+
+
+def test_cooling_that_never_freezes_is_rejected():
+    G = nx.barabasi_albert_graph(100, 2, seed=1)
+    for cooling in (1.0, 1.5, 0, -0.5):
+        with pytest.raises(ValueError):
+            rewire(G.copy(), 0.95, 'ba', method='anneal', cooling=cooling)
+
+
+def test_seeded_run_is_the_same_after_a_cache_hit():
+    G = nx.barabasi_albert_graph(200, 2, seed=3)
+    cache = ExtremeCache()
+    runs = []
+    for _ in range(2):
+        out, results = rewire(G.copy(), 0.1, 'ba', method='new', seed=1, cache=cache)
+        runs.append((len(results), sorted(map(sorted, out.edges()))))
+    assert runs[0] == runs[1]
+
+
+def test_sampled_validation_recounts_periodically():
+    G = CompactGraph.from_graph(nx.barabasi_albert_graph(100, 2, seed=1))
+    G.track_degrees()
+    #move an edge end behind the degree array's back
+    u, v = G.edge_array()[0].tolist()
+    G.edges[0, 1] = next(w for w in range(G.n_nodes) if w not in (u, v) and not G.has_edge(u, w))
+    checks = [degrees_preserved(G, None, 'sampled') for _ in range(VALIDATE_EVERY)]
+    assert all(checks[:-1]) and not checks[-1]
+    assert not degrees_preserved(G, None, 'sampled', final=True)
+
+
+def pairing_inputs(G):
+    #the nodes in order of appearance, as the extreme phase takes them, and their degrees
+    nodes = list(dict.fromkeys(node for edge in G.edges() for node in edge))
+    degree = dict(G.degree())
+    descending = sorted(nodes, key=degree.get, reverse=True)
+    ascending = sorted(nodes, key=degree.get)
+    return descending, ascending, degree
+
+
+def baseline_assortative_pairing(nodes, degree):
+    #double loop the assortative extreme phase used before assortative_pairing
+    new_neighbors = {node: set() for node in nodes}
+    for ind, node in enumerate(nodes):
+        for target in nodes[ind:]:
+            if len(new_neighbors[node]) < degree[node]:
+                if len(new_neighbors[target]) < degree[target]:
+                    if node != target:
+                        new_neighbors[node].add(target)
+                        new_neighbors[target].add(node)
+    return {frozenset((node, target)) for node in new_neighbors for target in new_neighbors[node]}
+
+
+def baseline_disassortative_pairing(descending, ascending, degree):
+    #double loop the disassortative extreme phase used before disassortative_pairing
+    new_neighbors = {node: set() for node in descending}
+    for node in descending:
+        for target in ascending:
+            if len(new_neighbors[node]) < degree[node]:
+                if len(new_neighbors[target]) < degree[target]:
+                    if node != target:
+                        new_neighbors[node].add(target)
+                        new_neighbors[target].add(node)
+    return {frozenset((node, target)) for node in new_neighbors for target in new_neighbors[node]}
+
+
+def pairing_graphs():
+    yield nx.Graph([(0, 1), (0, 2), (0, 3), (1, 2), (3, 4), (4, 5), (5, 0)])
+    for seed in range(5):
+        yield nx.barabasi_albert_graph(120, 2, seed=seed)
+        yield nx.gnm_random_graph(80, 200, seed=seed)
+
+
+def test_assortative_pairing_matches_the_double_loop():
+    for G in pairing_graphs():
+        descending, _, degree = pairing_inputs(G)
+        edges = assortative_pairing(descending, degree)
+        assert len(edges) == len({frozenset(edge) for edge in edges})
+        assert {frozenset(edge) for edge in edges} == baseline_assortative_pairing(descending, degree)
+
+
+def test_disassortative_pairing_matches_the_double_loop():
+    for G in pairing_graphs():
+        descending, ascending, degree = pairing_inputs(G)
+        edges = disassortative_pairing(descending, ascending, degree)
+        assert len(edges) == len({frozenset(edge) for edge in edges})
+        assert {frozenset(edge) for edge in edges} == baseline_disassortative_pairing(descending, ascending, degree)
+
+
+def baseline_cdf(distribution, params):
+    #tables as the generators built them, one sum per degree
+    inf = np.arange(1000)
+    Input = np.arange(1, 5000)
+    if distribution == 'weibull':
+        sum1 = np.array([np.sum((((j+inf)/params[0])**(params[1]-1))*np.exp(-(((j+inf)/params[0])**params[1]))) for j in Input])
+        inf_sum = np.sum((((inf + 1)/params[0])**(params[1]-1)*np.exp(-1*((inf + 1)/params[0])**params[1])))
+        y = sum1/inf_sum
+    elif distribution == 'lognormal':
+        sum1 = np.array([np.sum( (1.0/(j+inf))*np.exp(-((np.log(j+inf)-params[0])**2)/(2*(params[1]**2)))) for j in Input])
+        inf_sum = np.sum( (1.0/(inf+1)) * np.exp(-((np.log(inf+1)-params[0])**2)/(2*params[1]**2) ) )
+        y = sum1/inf_sum
+    else:
+        y = np.exp((-1/params[0])*(Input-1))
+    return 1 - y
+
+
+def baseline_sample(cdf, size):
+    #scan of the cdf per draw the generators used before searchsorted
+    x = []
+    for val in np.random.uniform(0,1, size):
+        for i in range(len(cdf) - 1):
+            if val >= cdf[i]:
+                if val < cdf[i + 1]:
+                    x.append(i + 1)
+    return x
+
+
+def test_cdf_tables_match_the_per_degree_sums():
+    for distribution, params in [('weibull', [2.1, 0.48]), ('lognormal', [1.4, 0.6]), ('exponential', [4.5])]:
+        cdf = build_cdf(distribution, params)
+        assert cdf.shape == (4999,)
+        assert np.allclose(cdf, baseline_cdf(distribution, params), rtol=0, atol=1e-12)
+        assert np.array_equal(CDFCache().get(distribution, params), cdf)
+
+
+def test_sampled_degrees_match_the_scan_under_a_seed():
+    for distribution, params in [('weibull', [2.1, 0.48]), ('lognormal', [1.4, 0.6]), ('exponential', [4.5])]:
+        cdf = build_cdf(distribution, params)
+        np.random.seed(7)
+        x = baseline_sample(cdf, 300)
+        for chunk_size in [None, 64]:
+            np.random.seed(7)
+            assert sample_degrees(cdf, 300, chunk_size).tolist() == x
+
+
+def test_resumed_run_matches_an_uninterrupted_run(tmp_path):
+    #stops a checkpointed run part way, resumes it and compares with a run left alone
+    G = nx.barabasi_albert_graph(300, 3, seed=2)
+    for method in ['original', 'new']:
+        H, full = rewire(G.copy(), 0.2, 'x', method=method, seed=5)
+        path = str(tmp_path / (method + '.npz'))
+        rows = rewire_iter(G.copy(), 0.2, 'x', method=method, seed=5, checkpoint_path=path, checkpoint_every=10, log='all')
+        for n, row in enumerate(rows):
+            if n == 30:
+                break
+        rows.close()
+        H_resumed, resumed = resume_rewire(path)
+        assert len(resumed) == len(full) > 31
+        assert np.allclose(resumed['r'].values, full['r'].values)
+        assert (resumed['edges_rewired'].values == full['edges_rewired'].values).all()
+        assert sorted(map(sorted, H_resumed.edges())) == sorted(map(sorted, H.edges()))
+
+
+def test_rewire_ensemble_reproducible_under_a_seed():
+    #the same root seed gives the same rewired graphs whatever the number of workers
+    graphs = [nx.barabasi_albert_graph(150, 2, seed=s) for s in range(2)]
+    runs = []
+    for workers in [1, 2]:
+        run = {}
+        for job, G, results in rewire_ensemble(graphs, [-0.05, 0.1], method='original', workers=workers, seeds=42):
+            run[job['graph'], job['target']] = (job['seed'], list(results['r']), sorted(map(sorted, G.edges())))
+        runs.append(run)
+    assert len(runs[0]) == 4
+    assert runs[0] == runs[1]
+
+
+def recorder_rows(n):
+    #n iteration rows with known totals, then a summary row
+    for i in range(n):
+        yield {'name': 'x', 'iteration': i, 'time': 0.25, 'r': 0.0006*i, 'target_r': 0.1, 'sample_size': 2,
+               'edges_rewired': 2, 'duplicate_edges': 0.5*(i % 3), 'self_edges': i % 2, 'existing_edges': 1,
+               'partial_swaps': 0, 'preserved': True, 'method': 0, 'summary': 0}
+    yield {'name': 'x', 'iteration': n - 1, 'time': 0.0, 'r': 0.0006*(n - 1), 'target_r': 0.1, 'sample_size': 2,
+           'edges_rewired': 0, 'duplicate_edges': 0, 'self_edges': 0, 'existing_edges': 0,
+           'partial_swaps': 0, 'preserved': True, 'method': 0, 'summary': 1}
+
+
+def test_results_recorder_log_policies():
+    #rows kept by each policy, and totals over every row appended whatever is kept
+    kept = {'all': list(range(50)),
+            'none': [],
+            'every_k': [0, 10, 20, 30, 40],
+            'log_spaced': [0, 1, 2, 3, 5, 6, 7, 9, 12, 15, 19, 25, 31, 39],
+            'r_delta': list(range(0, 50, 2))}
+    for log, iterations in kept.items():
+        recorder = ResultsRecorder(log=log, log_every=10, log_per_decade=10, log_epsilon=1e-3)
+        for row in recorder_rows(50):
+            recorder.append(row)
+        assert recorder.column('iteration').tolist() == iterations + [49]
+        assert recorder.column('summary').tolist() == [0]*len(iterations) + [1]
+        assert recorder.appended == 51
+        assert recorder.totals == {'time': 12.5, 'edges_rewired': 100, 'duplicate_edges': 24.5,
+                                   'self_edges': 25, 'existing_edges': 50, 'partial_swaps': 0}
+        assert recorder.last('summary') == 1
+
+
+def test_rewire_summary_same_under_every_log_policy():
+    G = nx.barabasi_albert_graph(300, 3, seed=2)
+    _, full = rewire(G.copy(), 0.1, 'x', method='original', seed=3, log='all')
+    iterations = full[full['summary'] == 0]
+    assert full['edges_rewired'].iloc[-1] == iterations['edges_rewired'].sum()
+    for log in ['none', 'every_k', 'log_spaced', 'r_delta']:
+        _, results = rewire(G.copy(), 0.1, 'x', method='original', seed=3, log=log, log_every=5)
+        assert results['summary'].tolist() == [0]*(len(results) - 1) + [1]
+        assert results.iloc[-1].drop('time').equals(full.iloc[-1].drop('time'))
+    _, results = rewire(G.copy(), 0.1, 'x', method='original', seed=3, log='none')
+    assert len(results) == 1